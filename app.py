@@ -1,10 +1,20 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+import sys
+import time
+from itertools import islice
+import pymysql
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, g
 from werkzeug.utils import secure_filename
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from config import config
-from utils.database import init_db, close_db, execute_query
+from utils.database import init_db, close_db, execute_query, get_pool_stats, query_stats, LockTimeout
 from utils.helpers import save_uploaded_file, format_datetime, get_user_status_text
+from utils.storage import iter_uploads
+from utils.images import resolve_variant, variant_name, variants_pending
+from utils.occupancy import occupancy_index
+from utils.events import booking_events
+from utils.jobs import job_queue
+from utils import metrics
 from models.user import User
 from models.venue import VenueSubmission, Venue, VenueManager
 from models.admin import Admin
@@ -16,12 +26,75 @@ def create_app(config_name=None):
     config_name = config_name or os.getenv('FLASK_ENV', 'default')
     app.config.from_object(config[config_name])
     
-    # Initialize database
+    # Register teardown handler (before init_db so its connection goes back to the pool)
+    app.teardown_appcontext(close_db)
+    
+    # Initialize database (schema already current -> one SELECT, admins present -> no hashing)
+    init_started = time.perf_counter()
     with app.app_context():
         init_db()
+    print(f"Database bootstrap finished in {time.perf_counter() - init_started:.3f}s", file=sys.stderr)
     
-    # Register teardown handler
-    app.teardown_appcontext(close_db)
+    # Per-request DB timing (query count / time are accumulated in execute_query's cursor)
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        # 后台任务 worker 按进程在首个请求时启动（gunicorn fork 后的每个 worker 各自启动）
+        job_queue.ensure_started(app)
+    
+    @app.after_request
+    def add_server_timing(response):
+        endpoint = request.endpoint or 'unknown'
+        timings = [f'db;dur={g.get("db_time", 0.0) * 1000:.1f};desc="{g.get("db_query_count", 0)} queries"']
+        if 'request_started' in g:
+            elapsed = time.perf_counter() - g.request_started
+            timings.append(f'app;dur={elapsed * 1000:.1f}')
+            metrics.http_request_duration.observe(elapsed, (endpoint, request.method))
+        response.headers['Server-Timing'] = ', '.join(timings)
+        metrics.http_responses.inc(labels=(endpoint, str(response.status_code)))
+        metrics.flush()
+        return response
+    
+    # 多 worker 时各进程定期写入快照，/metrics 汇总所有 worker
+    metrics.configure_multiprocess(app.config.get('METRICS_DIR'))
+    
+    # 以下指标在采集时读取当前值
+    def pool_stat(*keys):
+        def read():
+            pool = app.extensions.get('mysql_pool')
+            if pool is None:
+                return None
+            stats = pool.stats()
+            if len(keys) == 1:
+                return stats[keys[0]]
+            return {(key,): stats[key] for key in keys}
+        return read
+    
+    metrics.registry.gauge('db_pool_connections', 'MySQL pool connections by state',
+                           pool_stat('in_use', 'idle', 'open', 'overflow'), ('state',))
+    metrics.registry.gauge('db_pool_checkouts_total', 'MySQL pool checkouts',
+                           pool_stat('checkouts'), type_name='counter')
+    metrics.registry.gauge('db_pool_wait_seconds_total', 'Time spent waiting for a pooled connection',
+                           pool_stat('total_wait_time'), type_name='counter')
+    metrics.registry.gauge('db_pool_timeouts_total', 'Pool checkouts that timed out',
+                           pool_stat('timeouts'), type_name='counter')
+    metrics.registry.gauge('occupancy_index_lookups_total', 'Occupancy index lookups by result',
+                           lambda: (lambda stats: {('hit',): stats['hits'], ('miss',): stats['misses']})(occupancy_index.stats()),
+                           ('result',), type_name='counter')
+    metrics.registry.gauge('booking_event_subscribers', 'Connected SSE booking event subscribers',
+                           lambda: booking_events.stats()['subscribers'])
+    
+    # In-process occupancy index
+    occupancy_index.configure(app.config['OCCUPANCY_CACHE_SIZE'], app.config['OCCUPANCY_CACHE_TTL'])
+    booking_events.configure(app.config['SSE_MAX_SUBSCRIBERS'], app.config['SSE_QUEUE_SIZE'],
+                             app.config['SSE_POLL_INTERVAL'])
+    job_queue.configure(
+        workers=app.config['JOB_WORKERS'],
+        poll_interval=app.config['JOB_POLL_INTERVAL'],
+        max_attempts=app.config['JOB_MAX_ATTEMPTS'],
+        retry_base=app.config['JOB_RETRY_BASE'],
+        lock_timeout=app.config['JOB_LOCK_TIMEOUT']
+    )
     
     # Template filters
     @app.template_filter('datetime')
@@ -43,12 +116,30 @@ def create_app(config_name=None):
     
     # Template function for image URL
     @app.template_global('image_url')
-    def image_url(filename):
-        """生成图片URL，兼容云端持久化存储"""
+    def image_url(filename, size=None):
+        """生成图片URL，兼容云端持久化存储
+        
+        size: None/'full' 为展示图，'thumb' 为缩略图（列表、预览用）；未生成派生版本时返回原图
+        """
         if filename:
-            return url_for('uploaded_file', filename=filename)
+            return url_for('uploaded_file', filename=filename, size=size)
         return None
     
+    def not_modified(etag, cache_control='no-cache'):
+        """If-None-Match 命中时直接返回 304（在查询数据库之前调用）；etag 为 None 时不做判断"""
+        if etag and request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return None
+    
+    def with_etag(response, etag, cache_control='no-cache'):
+        if etag:
+            response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        return response
+    
     # Routes
     @app.route('/')
     def index():
@@ -158,7 +249,7 @@ def create_app(config_name=None):
                 
                 if venue_number and time_slot:
                     venues_data.append({
-                        'number': int(venue_number),
+                        'number': int(venue_number) if venue_number.strip().isdigit() else None,
                         'time_slot': time_slot,
                         'plus_one_name': plus_one_name if plus_one_name.strip() else None,
                         'screenshot_file': screenshot_file
@@ -186,10 +277,20 @@ def create_app(config_name=None):
                                      time_slots=app.config['TIME_SLOTS'],
                                      venue_numbers=app.config['VENUE_NUMBERS'])
             
-            # Check for conflicts
+            valid_numbers = set(app.config['VENUE_NUMBERS'])
+            valid_slots = {slot for slot, _ in app.config['TIME_SLOTS']}
+            if any(v['number'] not in valid_numbers or v['time_slot'] not in valid_slots for v in venues_data):
+                flash('场地号或时间段无效！', 'error')
+                return render_template('venue_form.html',
+                                     time_slots=app.config['TIME_SLOTS'],
+                                     venue_numbers=app.config['VENUE_NUMBERS'])
+            
+            # Check for conflicts (one query for all venues)
+            conflicts = VenueManager.find_conflicts(
+                venue_date_obj, [(v['time_slot'], v['number']) for v in venues_data]
+            ) or set()
             for venue_data in venues_data:
-                occupied = VenueManager.get_occupied_venue_numbers(venue_date_obj, venue_data['time_slot'])
-                if venue_data['number'] in occupied:
+                if (venue_data['time_slot'], venue_data['number']) in conflicts:
                     flash(f'场地 {venue_data["number"]} 在 {dict(app.config["TIME_SLOTS"])[venue_data["time_slot"]]} 已被占用！', 'error')
                     return render_template('venue_form.html',
                                          time_slots=app.config['TIME_SLOTS'],
@@ -206,32 +307,35 @@ def create_app(config_name=None):
             # If after 10 PM, submission needs approval
             approval_status = 'pending' if is_after_10pm else 'approved'
             
-            # Create venue submission
-            submission_id = VenueSubmission.create(
-                session['user_id'], venue_date_obj, registration_name, is_free_submission, approval_status
+            # Handle screenshot uploads before taking the booking lock
+            for venue_data in venues_data:
+                venue_data['screenshot'] = None
+                if venue_data['screenshot_file'] and venue_data['screenshot_file'].filename:
+                    venue_data['screenshot'] = save_uploaded_file(venue_data['screenshot_file'])
+            
+            # Create submission and venues atomically (re-checks conflicts under a per-date lock)
+            result = VenueManager.book_venues(
+                session['user_id'], venue_date_obj, registration_name, venues_data,
+                is_free_submission, approval_status
             )
             
-            if submission_id:
-                # Add individual venues
-                success_count = 0
-                for venue_data in venues_data:
-                    # Handle screenshot upload
-                    screenshot_filename = None
-                    if venue_data['screenshot_file'] and venue_data['screenshot_file'].filename:
-                        screenshot_filename = save_uploaded_file(venue_data['screenshot_file'])
-                    
-                    if Venue.create(submission_id, venue_data['number'], venue_data['time_slot'], 
-                                  venue_data['plus_one_name'], screenshot_filename):
-                        success_count += 1
-                
-                if success_count > 0:
-                    if approval_status == 'pending':
-                        flash('场地信息提交成功！由于是晚上10点后提交，需要管理员审核后才会在统计页面显示。', 'warning')
-                    else:
-                        flash('场地信息提交成功！', 'success')
-                    return redirect(url_for('venue_form'))
+            if result['success']:
+                if approval_status == 'pending':
+                    flash('场地信息提交成功！由于是晚上10点后提交，需要管理员审核后才会在统计页面显示。', 'warning')
                 else:
-                    flash('场地添加失败，请重试。', 'error')
+                    flash('场地信息提交成功！', 'success')
+                return redirect(url_for('venue_form'))
+            
+            # 提交失败，清理本次已保存的截图
+            from utils.cleanup import DataCleanup
+            DataCleanup.delete_image_files([v['screenshot'] for v in venues_data if v['screenshot']])
+            
+            if result['conflicts']:
+                time_slot, venue_number = result['conflicts'][0]
+                flash(f'场地 {venue_number} 在 {dict(app.config["TIME_SLOTS"]).get(time_slot, time_slot)} 已被占用！', 'error')
+                return render_template('venue_form.html',
+                                     time_slots=app.config['TIME_SLOTS'],
+                                     venue_numbers=app.config['VENUE_NUMBERS'])
             else:
                 flash('提交失败，请重试。', 'error')
         
@@ -251,17 +355,79 @@ def create_app(config_name=None):
         if venue_date and time_slot:
             try:
                 date_obj = datetime.strptime(venue_date, '%Y-%m-%d').date()
-                available = VenueManager.get_available_venue_numbers(date_obj, time_slot)
+                etag = occupancy_index.etag(date_obj, 'available', time_slot)
+                cached = not_modified(etag)
+                if cached:
+                    return cached
+                
                 occupied = VenueManager.get_occupied_venue_numbers(date_obj, time_slot)
-                return jsonify({
+                available = VenueManager.get_available_venue_numbers(date_obj, time_slot, occupied=occupied)
+                return with_etag(jsonify({
                     'available': available,
                     'occupied': occupied
-                })
+                }), etag)
             except ValueError:
                 return jsonify({'error': 'Invalid date format'}), 400
         
         return jsonify({'available': list(range(1, 25)), 'occupied': []})
     
+    @app.route('/venue-availability')
+    def venue_availability():
+        """日期范围内所有时间段的场地占用矩阵（每个时间段一个24位位图）"""
+        start = request.args.get('start') or date.today().strftime('%Y-%m-%d')
+        try:
+            start_date = datetime.strptime(start, '%Y-%m-%d').date()
+            days = int(request.args.get('days', 7))
+        except ValueError:
+            return jsonify({'error': 'Invalid date format'}), 400
+        
+        days = max(1, min(days, app.config['AVAILABILITY_MAX_DAYS']))
+        end_date = start_date + timedelta(days=days - 1)
+        etag = occupancy_index.etag([start_date + timedelta(days=offset) for offset in range(days)], 'matrix')
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        matrix = VenueManager.get_occupancy_matrix(start_date, end_date)
+        
+        time_slots = [slot_key for slot_key, _ in app.config['TIME_SLOTS']]
+        dates = {}
+        for offset in range(days):
+            day = start_date + timedelta(days=offset)
+            day_masks = matrix.get(day, {})
+            dates[day.strftime('%Y-%m-%d')] = [day_masks.get(slot_key, 0) for slot_key in time_slots]
+        
+        return with_etag(jsonify({
+            'start': start_date.strftime('%Y-%m-%d'),
+            'end': end_date.strftime('%Y-%m-%d'),
+            'venue_count': len(app.config['VENUE_NUMBERS']),
+            'time_slots': time_slots,
+            'occupied': dates
+        }), etag)
+    
+    @app.route('/events/bookings')
+    def booking_event_stream():
+        """指定日期的场地变更推送（Server-Sent Events，仅管理员；每个连接占用一个 worker 线程）"""
+        if 'admin_id' not in session:
+            return jsonify({'error': 'Unauthorized'}), 401
+        
+        venue_date = request.args.get('date')
+        try:
+            date_obj = datetime.strptime(venue_date or '', '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Invalid date format'}), 400
+        
+        subscription = booking_events.subscribe(date_obj)
+        if subscription is None:
+            return jsonify({'error': 'Too many subscribers'}), 503
+        # 变更由每个 worker 的 watcher 从共享占用版本读取，任一 worker 上的写入都会推送到这里
+        booking_events.ensure_watching(app)
+        
+        stream = booking_events.stream(subscription, max_duration=app.config['SSE_MAX_STREAM_SECONDS'])
+        response = app.response_class(stream, mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    
     # Admin routes
     @app.route('/admin/login', methods=['GET', 'POST'])
     def admin_login():
@@ -295,8 +461,8 @@ def create_app(config_name=None):
         user_stats = User.get_user_stats()
         pending_users = User.get_pending_users()
         today = date.today()
-        recent_submissions = VenueSubmission.get_all_active()[:10]  # Recent 10 submissions
-        pending_submissions_count = len(VenueSubmission.get_pending_submissions())
+        recent_submissions = VenueSubmission.get_active_page(limit=10)  # Recent 10 submissions
+        pending_submissions_count = VenueSubmission.count_pending_submissions()
         
         return render_template('admin/dashboard.html', 
                              user_stats=user_stats,
@@ -413,13 +579,18 @@ def create_app(config_name=None):
             # Test database
             test_result = execute_query('SELECT 1 as test', fetch='one')
             debug_info['database'] = f"Connected: {test_result}"
+            debug_info['db_pool'] = get_pool_stats()
+            debug_info['occupancy_index'] = occupancy_index.stats()
+            debug_info['booking_events'] = booking_events.stats()
+            debug_info['top_queries'] = query_stats.top(10)
+            debug_info['background_jobs'] = job_queue.stats()
             
             # Test config
             debug_info['time_slots'] = app.config.get('TIME_SLOTS', 'Not found')
             
             # Test VenueManager
             today = date.today()
-            summary = VenueManager.get_summary_by_date(today)
+            summary = VenueManager.get_summary_by_date(today, compact=True)
             debug_info['summary'] = f"Type: {type(summary)}, Keys: {list(summary.keys())}"
             
             # Test template
@@ -432,6 +603,57 @@ def create_app(config_name=None):
         
         return f"<pre>Debug Info:\n{debug_info}</pre>"
     
+    @app.route('/admin/db-pool-stats')
+    def admin_db_pool_stats():
+        """数据库连接池监控数据"""
+        if 'admin_id' not in session:
+            return jsonify({'success': False, 'message': '未授权'}), 401
+        
+        return jsonify({'success': True, 'pool': get_pool_stats()})
+    
+    @app.route('/admin/query-stats')
+    def admin_query_stats():
+        """按归一化 SQL 聚合的查询统计（耗时最多的前 N 条）"""
+        if 'admin_id' not in session:
+            return jsonify({'success': False, 'message': '未授权'}), 401
+        
+        limit = request.args.get('limit', 20, type=int)
+        order_by = request.args.get('order_by', 'total')
+        if request.args.get('reset') == '1':
+            query_stats.reset()
+        return jsonify({'success': True, 'queries': query_stats.top(limit, order_by)})
+    
+    @app.route('/admin/background-jobs')
+    def admin_background_jobs():
+        """后台任务队列状态和死信列表"""
+        if 'admin_id' not in session:
+            return jsonify({'success': False, 'message': '未授权'}), 401
+        
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        return jsonify({
+            'success': True,
+            'stats': job_queue.stats(),
+            'dead_letters': job_queue.dead_letters(limit)
+        })
+    
+    @app.route('/admin/background-jobs/<int:job_id>/retry', methods=['POST'])
+    def admin_retry_background_job(job_id):
+        """将死信任务重新入队"""
+        if 'admin_id' not in session:
+            return jsonify({'success': False, 'message': '未授权'}), 401
+        
+        if job_queue.retry(job_id):
+            return jsonify({'success': True, 'message': '任务已重新入队'})
+        return jsonify({'success': False, 'message': '任务不存在或不在死信列表中'}), 404
+    
+    @app.route('/admin/occupancy-stats')
+    def admin_occupancy_stats():
+        """进程内场地占用索引命中率等统计"""
+        if 'admin_id' not in session:
+            return jsonify({'success': False, 'message': '未授权'}), 401
+        
+        return jsonify({'success': True, 'occupancy_index': occupancy_index.stats()})
+    
     @app.route('/admin/venues-summary')
     def admin_venues_summary():
         if 'admin_id' not in session:
@@ -455,7 +677,7 @@ def create_app(config_name=None):
             
             # Get summary data with error handling
             try:
-                summary = VenueManager.get_summary_by_date(date_obj)
+                summary = VenueManager.get_summary_by_date(date_obj, compact=True)
                 print(f"Summary data retrieved successfully, keys: {list(summary.keys())}")
             except Exception as e:
                 print(f"Error getting venue summary: {e}")
@@ -465,8 +687,7 @@ def create_app(config_name=None):
             
             # Get pending count with error handling
             try:
-                pending_submissions = VenueSubmission.get_pending_submissions()
-                pending_count = len(pending_submissions) if pending_submissions else 0
+                pending_count = VenueSubmission.count_pending_submissions()
                 print(f"Pending submissions count: {pending_count}")
             except Exception as e:
                 print(f"Error getting pending submissions: {e}")
@@ -553,49 +774,8 @@ def create_app(config_name=None):
         if 'admin_id' not in session:
             return redirect(url_for('admin_login'))
         
-        # 获取所有活跃的场地提交，按日期和时间段分组
-        query = '''
-            SELECT vs.id, vs.venue_date, vs.registration_name, vs.is_free_submission,
-                   u.group_name, u.group_type, u.id as user_id,
-                   GROUP_CONCAT(CONCAT(v.id, ':', v.venue_number, ':', v.time_slot, ':', IFNULL(v.plus_one_name, '')) SEPARATOR '|') as venues_data
-            FROM venue_submissions vs
-            JOIN users u ON vs.user_id = u.id
-            JOIN venues v ON vs.id = v.submission_id
-            WHERE vs.status = 'active' AND vs.approval_status = 'approved'
-            GROUP BY vs.id
-            ORDER BY vs.venue_date DESC, vs.upload_time DESC
-            LIMIT 50
-        '''
-        submissions_data = execute_query(query, fetch=True)
-        
-        # 解析场地数据
-        submissions = []
-        for row in submissions_data or []:
-            venues = []
-            if row[7]:  # venues_data
-                for venue_data in row[7].split('|'):
-                    parts = venue_data.split(':')
-                    if len(parts) >= 3:
-                        venues.append({
-                            'id': int(parts[0]),
-                            'venue_number': int(parts[1]),
-                            'time_slot': parts[2],
-                            'plus_one_name': parts[3] if len(parts) > 3 and parts[3] else None
-                        })
-            
-            submissions.append({
-                'id': row[0],
-                'venue_date': row[1],
-                'registration_name': row[2],
-                'is_free_submission': row[3],
-                'group_name': row[4],
-                'group_type': row[5],
-                'user_id': row[6],
-                'venues': venues
-            })
-        
+        # 页面按所选日期从 /admin/venue-exchange-data 加载场地，这里不预先查询提交
         return render_template('admin/venue_exchange.html',
-                             submissions=submissions,
                              time_slots=app.config['TIME_SLOTS'])
     
     @app.route('/admin/migrate-venue', methods=['POST'])
@@ -631,81 +811,82 @@ def create_app(config_name=None):
         except ValueError:
             return jsonify({'success': False, 'message': '无效的日期格式'}), 400
         
-        # 获取原场地信息
-        original_venue = execute_query('''
-            SELECT v.id, v.venue_number, v.time_slot, v.plus_one_name, v.submission_id,
-                   vs.venue_date, vs.registration_name, u.group_name, u.group_type
-            FROM venues v
-            JOIN venue_submissions vs ON v.submission_id = vs.id
-            JOIN users u ON vs.user_id = u.id
-            WHERE v.id = %s
-        ''', (venue_id,), fetch='one')
+        # 在一个事务中完成查询原场地、冲突检查和迁移
+        time_slots_dict = dict(app.config['TIME_SLOTS'])
+        try:
+            result = VenueManager.migrate_venue(venue_id, new_venue_number, new_time_slot, venue_date_obj)
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'迁移失败：{str(e)}'}), 500
         
-        if not original_venue:
+        if result['error'] == 'not_found':
             return jsonify({'success': False, 'message': '场地不存在'}), 404
         
-        # 检查目标位置是否已被占用
-        conflict = execute_query('''
-            SELECT v.id FROM venues v
-            JOIN venue_submissions vs ON v.submission_id = vs.id
-            WHERE v.venue_number = %s AND v.time_slot = %s AND vs.venue_date = %s 
-            AND v.id != %s AND vs.status = 'active'
-        ''', (new_venue_number, new_time_slot, new_venue_date, venue_id), fetch='one')
-        
-        if conflict:
+        if result['error'] == 'conflict':
             return jsonify({
                 'success': False, 
-                'message': f'目标位置已被占用：场地{new_venue_number}在{dict(app.config["TIME_SLOTS"])[new_time_slot]}时段({new_venue_date})已有预订'
+                'message': f'目标位置已被占用：场地{new_venue_number}在{time_slots_dict[new_time_slot]}时段({new_venue_date})已有预订'
             }), 409
         
-        # 执行场地迁移
+        original = result['original']
+        return jsonify({
+            'success': True, 
+            'message': f'场地迁移成功！{original["group_name"]}({original["registration_name"]})的场地从{original["venue_number"]}号({time_slots_dict.get(original["time_slot"], original["time_slot"])}, {original["venue_date"]})迁移到{new_venue_number}号({time_slots_dict[new_time_slot]}, {new_venue_date})'
+        })
+    
+    @app.route('/admin/batch-move-venues', methods=['POST'])
+    def admin_batch_move_venues():
+        """批量调整同一日期的场地（互换、循环调整），整体校验后原子写入"""
+        if 'admin_id' not in session:
+            return jsonify({'success': False, 'message': '未授权'}), 401
+        
+        data = request.get_json() or {}
+        moves_data = data.get('moves') or []
+        
         try:
-            # 如果迁移到不同日期，需要更新或创建新的submission
-            if str(venue_date_obj) != str(original_venue[5]):
-                # 需要创建新的submission或找到同日期的submission
-                existing_submission = execute_query('''
-                    SELECT vs.id FROM venue_submissions vs
-                    JOIN users u ON vs.user_id = u.id
-                    WHERE vs.venue_date = %s AND vs.registration_name = %s 
-                    AND u.group_name = %s AND vs.status = 'active'
-                ''', (new_venue_date, original_venue[6], original_venue[7]), fetch='one')
-                
-                if existing_submission:
-                    # 找到同用户同日期的submission，更新venue的submission_id
-                    new_submission_id = existing_submission[0]
-                else:
-                    # 创建新的submission
-                    user_id = execute_query('''
-                        SELECT u.id FROM users u
-                        JOIN venue_submissions vs ON vs.user_id = u.id
-                        WHERE vs.id = %s
-                    ''', (original_venue[4],), fetch='one')[0]
-                    
-                    execute_query('''
-                        INSERT INTO venue_submissions (user_id, venue_date, registration_name, is_free_submission, status, approval_status)
-                        SELECT user_id, %s, registration_name, is_free_submission, 'active', 'approved'
-                        FROM venue_submissions WHERE id = %s
-                    ''', (new_venue_date, original_venue[4]))
-                    
-                    new_submission_id = execute_query('SELECT LAST_INSERT_ID()', fetch='one')[0]
-                
-                # 更新场地信息
-                execute_query('''
-                    UPDATE venues SET venue_number = %s, time_slot = %s, submission_id = %s WHERE id = %s
-                ''', (new_venue_number, new_time_slot, new_submission_id, venue_id))
-            else:
-                # 同日期迁移，只更新场地号和时间段
-                execute_query('''
-                    UPDATE venues SET venue_number = %s, time_slot = %s WHERE id = %s
-                ''', (new_venue_number, new_time_slot, venue_id))
-            
-            return jsonify({
-                'success': True, 
-                'message': f'场地迁移成功！{original_venue[7]}({original_venue[6]})的场地从{original_venue[1]}号({dict(app.config["TIME_SLOTS"])[original_venue[2]]}, {original_venue[5]})迁移到{new_venue_number}号({dict(app.config["TIME_SLOTS"])[new_time_slot]}, {new_venue_date})'
-            })
-            
+            venue_date_obj = datetime.strptime(data.get('date') or '', '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'success': False, 'message': '无效的日期格式'}), 400
+        
+        if not moves_data:
+            return jsonify({'success': False, 'message': '缺少必要参数'}), 400
+        if len(moves_data) > app.config['BATCH_MOVE_MAX']:
+            return jsonify({'success': False, 'message': f'一次最多调整{app.config["BATCH_MOVE_MAX"]}个场地'}), 400
+        
+        time_slots_dict = dict(app.config['TIME_SLOTS'])
+        moves = []
+        for move in moves_data:
+            try:
+                venue_id = int(move.get('venue_id'))
+                new_venue_number = int(move.get('new_venue_number'))
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'message': '场地号必须是数字'}), 400
+            new_time_slot = move.get('new_time_slot')
+            if new_venue_number < 1 or new_venue_number > 24:
+                return jsonify({'success': False, 'message': '场地号必须在1-24之间'}), 400
+            if new_time_slot not in time_slots_dict:
+                return jsonify({'success': False, 'message': '无效的时间段'}), 400
+            moves.append((venue_id, new_time_slot, new_venue_number))
+        
+        if len({venue_id for venue_id, _, _ in moves}) != len(moves):
+            return jsonify({'success': False, 'message': '同一场地不能在一次调整中出现多次'}), 400
+        
+        try:
+            result = VenueManager.apply_moves(venue_date_obj, moves)
         except Exception as e:
-            return jsonify({'success': False, 'message': f'迁移失败：{str(e)}'}), 500
+            return jsonify({'success': False, 'message': f'调整失败：{str(e)}'}), 500
+        
+        if result['error'] == 'not_found':
+            return jsonify({
+                'success': False,
+                'message': f'以下场地不存在或不在{venue_date_obj}：{", ".join(map(str, result["missing"]))}'
+            }), 404
+        
+        if result['error'] == 'conflict':
+            conflicts = '，'.join(f'场地{venue_number}({time_slots_dict.get(time_slot, time_slot)})'
+                                 for time_slot, venue_number in result['conflicts'])
+            return jsonify({'success': False, 'message': f'调整后存在冲突：{conflicts}'}), 409
+        
+        return jsonify({'success': True, 'message': f'已调整 {len(result["booked"])} 个场地'})
     
     @app.route('/admin/get-venue-info/<int:venue_id>')
     def admin_get_venue_info(venue_id):
@@ -740,6 +921,15 @@ def create_app(config_name=None):
             }
         })
     
+    @app.route('/metrics')
+    def metrics_endpoint():
+        """Prometheus 文本格式指标（设置 METRICS_DIR 时为所有 worker 的汇总）；配置 METRICS_TOKEN 时需携带 Bearer 令牌"""
+        token = app.config.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return 'Unauthorized', 401
+        
+        return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+    
     # Favicon route
     @app.route('/favicon.ico')
     def favicon():
@@ -754,9 +944,16 @@ def create_app(config_name=None):
     # Image serving route for persistent storage
     @app.route('/uploads/<filename>')
     def uploaded_file(filename):
-        """服务图片文件，支持云端持久化存储"""
+        """服务图片文件，支持云端持久化存储
+        
+        - 文件名为内容哈希或随机值，内容不会变化：返回所请求的版本时设置长期缓存 + immutable；
+          派生版本尚未生成、暂时回退到其他文件时只短期缓存
+        - 支持 ETag/Last-Modified 条件请求和 Range 请求，文件经 wsgi.file_wrapper 发送（服务器支持时零拷贝）
+        - 配置 UPLOAD_ACCEL_REDIRECT（nginx）或 USE_X_SENDFILE（Apache 等）时由反向代理发送文件
+        """
         import os
-        from flask import send_from_directory, abort
+        import mimetypes
+        from flask import send_file, abort
         from werkzeug.utils import secure_filename
         
         # 安全检查文件名
@@ -764,37 +961,35 @@ def create_app(config_name=None):
         if not filename:
             abort(404)
         
-        upload_folder = app.config['UPLOAD_FOLDER']
-        file_path = os.path.join(upload_folder, filename)
-        
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
+        # 查找文件：按 size 选择展示图/缩略图，分片目录 ab/cd/ 优先，兼容尚未迁移的根目录旧文件
+        size = request.args.get('size')
+        file_path, served_name = resolve_variant(filename, size)
+        if not file_path:
             abort(404)
         
-        # 检查文件权限和路径安全性
-        if not os.path.isfile(file_path):
-            abort(404)
-            
-        try:
-            return send_from_directory(upload_folder, filename)
-        except Exception as e:
-            print(f"Error serving file {filename}: {e}")
-            # 如果send_from_directory失败，尝试直接读取文件
+        final = served_name == variant_name(filename, 'thumb' if size == 'thumb' else 'full') \
+            or not variants_pending(filename)
+        max_age = app.config['UPLOAD_CACHE_MAX_AGE'] if final else app.config['UPLOAD_FALLBACK_MAX_AGE']
+        
+        accel_prefix = app.config.get('UPLOAD_ACCEL_REDIRECT')
+        if accel_prefix:
+            # 反向代理按内部路径发送文件，Python 只返回响应头
+            relative_path = os.path.relpath(file_path, app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+            response = app.response_class()
+            response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + relative_path
+            response.mimetype = mimetypes.guess_type(served_name)[0] or 'application/octet-stream'
+        else:
             try:
-                from flask import Response
-                with open(file_path, 'rb') as f:
-                    file_data = f.read()
-                
-                # 根据文件扩展名设置MIME类型
-                import mimetypes
-                mime_type, _ = mimetypes.guess_type(filename)
-                if not mime_type:
-                    mime_type = 'application/octet-stream'
-                
-                return Response(file_data, mimetype=mime_type)
-            except Exception as e2:
-                print(f"Error reading file directly {filename}: {e2}")
+                response = send_file(file_path, download_name=served_name, conditional=True, max_age=max_age)
+            except OSError as e:
+                print(f"Error serving file {served_name}: {e}", file=sys.stderr)
                 abort(404)
+        
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        if final:
+            response.cache_control.immutable = True
+        return response
     
     # Debug route for image path testing
     @app.route('/debug/image-config')
@@ -813,15 +1008,15 @@ def create_app(config_name=None):
         
         if os.path.exists(upload_folder) and os.path.isdir(upload_folder):
             try:
-                files = os.listdir(upload_folder)
-                for f in files[:10]:  # 只显示前10个文件
-                    file_path = os.path.join(upload_folder, f)
-                    if os.path.isfile(file_path):
-                        debug_info['files_in_folder'].append({
-                            'name': f,
-                            'size': os.path.getsize(file_path),
-                            'permissions': oct(os.stat(file_path).st_mode)[-3:]
-                        })
+                # 惰性遍历，只读取前10个文件，不列出整个目录
+                for f, file_path in islice(iter_uploads(upload_folder), 10):
+                    file_stat = os.stat(file_path)
+                    debug_info['files_in_folder'].append({
+                        'name': f,
+                        'path': os.path.relpath(file_path, upload_folder),
+                        'size': file_stat.st_size,
+                        'permissions': oct(file_stat.st_mode)[-3:]
+                    })
             except Exception as e:
                 debug_info['folder_error'] = str(e)
         
@@ -843,6 +1038,11 @@ def create_app(config_name=None):
         except ValueError:
             return jsonify({'success': False, 'message': '日期格式无效'}), 400
         
+        etag = occupancy_index.etag(date_obj, 'exchange')
+        cached = not_modified(etag, 'private, no-cache')
+        if cached:
+            return cached
+        
         # 查询指定日期的所有场地（与场地汇总保持一致的筛选条件）
         query = '''
             SELECT v.id, v.venue_number, v.time_slot, v.plus_one_name,
@@ -877,7 +1077,7 @@ def create_app(config_name=None):
                 'group_type': venue[6]
             })
         
-        return jsonify({'success': True, 'venues': venues})
+        return with_etag(jsonify({'success': True, 'venues': venues}), etag, 'private, no-cache')
     
     @app.route('/admin/quick-venue-edit', methods=['POST'])
     def admin_quick_venue_edit():
@@ -902,31 +1102,22 @@ def create_app(config_name=None):
             if new_time_slot not in time_slots_dict:
                 return jsonify({'success': False, 'message': '无效的时间段'}), 400
             
-            # 检查目标位置是否冲突（同一天同一时间段同一场地号）
-            conflict_check = execute_query('''
-                SELECT v.id FROM venues v
-                JOIN venue_submissions vs ON v.submission_id = vs.id
-                WHERE v.venue_number = %s AND v.time_slot = %s 
-                AND vs.venue_date = (
-                    SELECT vs2.venue_date FROM venue_submissions vs2
-                    JOIN venues v2 ON vs2.id = v2.submission_id
-                    WHERE v2.id = %s
-                )
-                AND v.id != %s
-                AND vs.approval_status = 'approved'
-            ''', (new_venue_number, new_time_slot, venue_id, venue_id), fetch='one')
-            
-            if conflict_check:
-                return jsonify({'success': False, 'message': f'场地{new_venue_number}号在{time_slots_dict[new_time_slot]}已被占用'}), 400
-            
-            # 更新场地信息
-            result = execute_query('''
-                UPDATE venues SET venue_number = %s, time_slot = %s WHERE id = %s
-            ''', (new_venue_number, new_time_slot, venue_id))
+            slot_info = Venue.get_slot_info(venue_id)
+            if slot_info is None:
+                return jsonify({'success': False, 'message': '场地不存在'}), 404
+            venue_date = slot_info[0]
             
-            if result is None:
+            # 在该日期的预订锁内检查冲突并更新（与预订、批量调整互斥）
+            try:
+                result = VenueManager.apply_moves(venue_date, [(venue_id, new_time_slot, new_venue_number)])
+            except (pymysql.Error, LockTimeout):
                 return jsonify({'success': False, 'message': '数据库更新失败'}), 500
             
+            if result['error'] == 'not_found':
+                return jsonify({'success': False, 'message': '场地不存在或所属提交已失效'}), 404
+            if result['error'] == 'conflict':
+                return jsonify({'success': False, 'message': f'场地{new_venue_number}号在{time_slots_dict[new_time_slot]}已被占用'}), 400
+            
             return jsonify({'success': True, 'message': '场地信息更新成功'})
             
         except Exception as e:
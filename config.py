@@ -11,6 +11,17 @@ class Config:
     MYSQL_DB = 'zeabur'
     MYSQL_PORT = 32360
     
+    # MySQL Connection Pool Configuration
+    MYSQL_POOL_SIZE = int(os.environ.get('MYSQL_POOL_SIZE', 5))  # 常驻连接数
+    MYSQL_POOL_MAX_OVERFLOW = int(os.environ.get('MYSQL_POOL_MAX_OVERFLOW', 10))  # 高峰期额外连接数
+    MYSQL_POOL_TIMEOUT = 10  # 等待空闲连接的最长秒数
+    MYSQL_POOL_RECYCLE = 3600  # 连接最长存活秒数
+    MYSQL_POOL_PRE_PING = 30  # 空闲超过该秒数的连接借出前先ping
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # 设置后 /metrics 需要 Bearer 令牌
+    # 多 worker 部署时各进程写入指标快照的目录，/metrics 合并所有 worker；不设置时只输出本进程
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    SLOW_QUERY_MS = 200  # 超过该毫秒数的查询输出慢查询日志（参数不输出），None 表示关闭
+    
     # File Upload Configuration
     # 在云端使用 /image 持久化存储，本地开发时使用 static/uploads
     # 通过检查环境变量或特定条件来判断是否在云端
@@ -18,12 +29,32 @@ class Config:
     UPLOAD_FOLDER = '/image' if is_cloud and os.path.exists('/image') else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    # /uploads 缓存：文件名按内容生成、内容不变，可长期缓存；派生版本未生成时的回退响应短期缓存
+    UPLOAD_CACHE_MAX_AGE = 365 * 24 * 3600
+    UPLOAD_FALLBACK_MAX_AGE = 60
+    # 反向代理发送文件：nginx 设置 X-Accel-Redirect 内部路径前缀（如 /_uploads/），
+    # 或开启 USE_X_SENDFILE（Apache mod_xsendfile / lighttpd）；均不设置时由应用发送
+    UPLOAD_ACCEL_REDIRECT = os.environ.get('UPLOAD_ACCEL_REDIRECT')
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+    # 截图派生版本（需安装 Pillow）：展示图和缩略图的最大宽高及 WebP 质量
+    IMAGE_MAX_SIZE = (1600, 3200)
+    IMAGE_QUALITY = 85
+    IMAGE_THUMB_SIZE = (480, 960)
+    IMAGE_THUMB_QUALITY = 75
+    
+    # 后台任务（上传后处理）：每进程 worker 线程数（0 表示同步处理）、轮询间隔、重试
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_POLL_INTERVAL = 5
+    JOB_MAX_ATTEMPTS = 5
+    JOB_RETRY_BASE = 10  # 第 n 次失败后等待 JOB_RETRY_BASE * 2^(n-1) 秒
+    JOB_LOCK_TIMEOUT = 120  # running 超过该秒数视为 worker 丢失，重新入队
     
     # Session Configuration
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
     
     # Application Settings
     GROUPS = ['一群', '二群']
+    USER_STATS_CACHE_TTL = 10  # 用户统计缓存秒数，0 表示不缓存
     
     # Venue Configuration  
     TIME_SLOTS = [
@@ -33,6 +64,15 @@ class Config:
     ]
     
     VENUE_NUMBERS = list(range(1, 25))  # 1-24场地
+    AVAILABILITY_MAX_DAYS = 31  # 场地占用矩阵接口一次最多查询的天数
+    BATCH_MOVE_MAX = 200  # 批量调整接口一次最多调整的场地数
+    OCCUPANCY_CACHE_SIZE = 512  # 进程内占用索引最多缓存的 (日期, 时间段) 数
+    OCCUPANCY_CACHE_TTL = 30  # 占用索引条目有效秒数（多进程部署时限制跨进程延迟）
+    # 场地变更推送（仅管理页面）：每个连接占用一个 gthread 线程，每进程订阅上限须远小于线程数
+    SSE_MAX_SUBSCRIBERS = int(os.environ.get('SSE_MAX_SUBSCRIBERS', 2))
+    SSE_MAX_STREAM_SECONDS = 300  # 单个推送连接最长秒数，到期后客户端自动重连
+    SSE_QUEUE_SIZE = 100  # 每个订阅者的待发送事件上限，超过即断开慢客户端
+    SSE_POLL_INTERVAL = 2  # 推送 watcher 读取共享占用版本的间隔秒数（跨 worker 的推送延迟上限）
     
     # Multi-venue Settings
     FREE_VENUE_COUNT = 2  # 贡献2个场地免单
@@ -0,0 +1,69 @@
+"""gunicorn 配置（gunicorn -c gunicorn.conf.py wsgi:app）
+
+- 多进程 + 每进程多线程（gthread）：进程数利用多核，线程在等待 MySQL 时让出
+- SSE 长连接（/events/bookings，仅管理页面使用）每个占用一个线程直到断开：每进程订阅上限
+  SSE_MAX_SUBSCRIBERS 默认取线程数的四分之一，超出返回 503；连接最长保持
+  SSE_MAX_STREAM_SECONDS 秒后由客户端重连，其余线程始终留给普通请求；变更通过共享占用版本
+  （occupancy_versions 表）在 worker 间传递，订阅满时管理页面退回带 ETag 的轮询
+- 平滑重载：kill -HUP <master pid>，旧 worker 处理完当前请求后退出
+- max_requests：每个 worker 处理一定请求数后自动重启，限制内存增长
+- 每个 worker 各有一个连接池，总连接数最多为
+  workers * (MYSQL_POOL_SIZE + MYSQL_POOL_MAX_OVERFLOW)，需小于 MySQL max_connections
+- 占用索引缓存、SSE 订阅为进程内数据，按 worker 分别统计；/metrics 指标由各 worker 写入
+  METRICS_DIR 下的快照文件，任一 worker 应答时合并所有 worker（master 启动时清空该目录）
+"""
+import glob
+import multiprocessing
+import os
+import sys
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+# 在加载应用之前设置，Config 读取该环境变量；显式设置时不得接近 threads
+os.environ.setdefault('SSE_MAX_SUBSCRIBERS', str(max(1, threads // 4)))
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# 默认不预加载：HUP 重载时 worker 会重新导入代码；开启后由 post_fork 丢弃继承的连接池
+preload_app = os.environ.get('GUNICORN_PRELOAD', '').lower() in ('1', 'true', 'yes')
+
+# 在加载应用之前设置，Config 读取该环境变量；同一主机运行多个实例时按端口区分目录
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f"mmyq-metrics-{os.environ.get('PORT', '5000')}"))
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    # 上一次运行留下的快照属于已退出的进程，清空后计数从零开始（与进程重启时一致）
+    directory = os.environ.get('METRICS_DIR')
+    if not directory:
+        return
+    for pattern in ('metrics-*.json', 'retired.json'):
+        for path in glob.glob(os.path.join(directory, pattern)):
+            os.remove(path)
+
+
+def post_fork(server, worker):
+    wsgi = sys.modules.get('wsgi')
+    if wsgi is not None:
+        from utils.database import reset_pool
+        reset_pool(wsgi.app)
+
+
+def worker_exit(server, worker):
+    # 等待后台任务线程处理完当前任务，避免任务停留在 running 直到超时重新入队
+    from utils.jobs import job_queue
+    job_queue.stop(timeout=graceful_timeout)
+    # 写入最终快照，下次采集时并入已退出进程的累计值
+    from utils import metrics
+    metrics.flush(force=True)
@@ -1,7 +1,13 @@
+import time
+from flask import current_app
 from werkzeug.security import check_password_hash, generate_password_hash
 from utils.database import execute_query
+from utils.occupancy import occupancy_index
 
 class User:
+    # get_user_stats 的短时缓存：(过期时间, 统计结果)
+    _stats_cache = None
+    
     def __init__(self, id=None, group_type=None, group_name=None, password_hash=None, status='pending', created_at=None):
         self.id = id
         self.group_type = group_type
@@ -17,6 +23,7 @@ class User:
             'INSERT INTO users (group_type, group_name, password_hash) VALUES (%s, %s, %s)',
             (group_type, group_name, password_hash)
         )
+        User.invalidate_stats_cache()
         return result is not None and result > 0
     
     @staticmethod
@@ -61,6 +68,8 @@ class User:
             'UPDATE users SET status = "approved" WHERE id = %s',
             (user_id,)
         )
+        User.invalidate_stats_cache()
+        occupancy_index.invalidate_all()
         return result is not None and result > 0
     
     @staticmethod
@@ -69,6 +78,8 @@ class User:
             'UPDATE users SET status = "rejected" WHERE id = %s',
             (user_id,)
         )
+        User.invalidate_stats_cache()
+        occupancy_index.invalidate_all()
         return result is not None and result > 0
     
     @staticmethod
@@ -101,6 +112,8 @@ class User:
             f'UPDATE users SET status = "approved" WHERE id IN ({placeholders})',
             tuple(user_ids)
         )
+        User.invalidate_stats_cache()
+        occupancy_index.invalidate_all()
         return result is not None and result > 0
     
     @staticmethod
@@ -114,6 +127,8 @@ class User:
             f'UPDATE users SET status = "rejected" WHERE id IN ({placeholders})',
             tuple(user_ids)
         )
+        User.invalidate_stats_cache()
+        occupancy_index.invalidate_all()
         return result is not None and result > 0
     
     @staticmethod
@@ -123,6 +138,8 @@ class User:
             'DELETE FROM users WHERE id = %s',
             (user_id,)
         )
+        User.invalidate_stats_cache()
+        occupancy_index.invalidate_all()
         return result is not None and result > 0
     
     @staticmethod
@@ -136,6 +153,8 @@ class User:
             f'DELETE FROM users WHERE id IN ({placeholders})',
             tuple(user_ids)
         )
+        User.invalidate_stats_cache()
+        occupancy_index.invalidate_all()
         return result is not None and result > 0
     
     @staticmethod
@@ -155,31 +174,39 @@ class User:
             self.password_hash = generate_password_hash(new_password)
         return success
     
+    @staticmethod
+    def invalidate_stats_cache():
+        """用户增删或状态变更后清除统计缓存"""
+        User._stats_cache = None
+    
     @staticmethod
     def get_user_stats():
-        """Get user statistics"""
-        stats = {}
+        """Get user statistics (one conditional-aggregate query, briefly cached)"""
+        ttl = current_app.config.get('USER_STATS_CACHE_TTL', 0)
+        cached = User._stats_cache
+        if ttl and cached and cached[0] > time.monotonic():
+            return dict(cached[1])
         
-        # Count by status
-        for status in ['pending', 'approved', 'rejected']:
-            result = execute_query(
-                'SELECT COUNT(*) FROM users WHERE status = %s',
-                (status,),
-                fetch='one'
-            )
-            stats[status] = result[0] if result else 0
+        statuses = ['pending', 'approved', 'rejected']
+        groups = current_app.config['GROUPS']
         
-        # Count by group type
-        for group in ['一群', '二群']:
-            result = execute_query(
-                'SELECT COUNT(*) FROM users WHERE group_type = %s',
-                (group,),
-                fetch='one'
-            )
-            stats[f'group_{group}'] = result[0] if result else 0
+        columns = ['COUNT(*)']
+        columns += ['SUM(status = %s)'] * len(statuses)
+        columns += ['SUM(group_type = %s)'] * len(groups)
+        result = execute_query(
+            f'SELECT {", ".join(columns)} FROM users',
+            tuple(statuses) + tuple(groups),
+            fetch='one'
+        )
+        counts = [int(value or 0) for value in result] if result else [0] * len(columns)
         
-        # Total count
-        result = execute_query('SELECT COUNT(*) FROM users', fetch='one')
-        stats['total'] = result[0] if result else 0
+        stats = {}
+        for status, count in zip(statuses, counts[1:]):
+            stats[status] = count
+        for group, count in zip(groups, counts[1 + len(statuses):]):
+            stats[f'group_{group}'] = count
+        stats['total'] = counts[0]
         
-        return stats
\ No newline at end of file
+        if ttl and result:
+            User._stats_cache = (time.monotonic() + ttl, dict(stats))
+        return stats
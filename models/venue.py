@@ -1,4 +1,7 @@
-from utils.database import execute_query
+import sys
+import pymysql
+from utils.database import execute_query, transaction, booking_lock, LockTimeout
+from utils.occupancy import occupancy_index
 from datetime import datetime, date
 
 class VenueSubmission:
@@ -17,16 +20,47 @@ class VenueSubmission:
 
     @staticmethod
     def create(user_id, venue_date, registration_name, is_free_submission=False, approval_status='approved'):
-        result = execute_query('''
+        return VenueSubmission.create_with_venues(
+            user_id, venue_date, registration_name, [], is_free_submission, approval_status
+        )
+
+    @staticmethod
+    def create_with_venues(user_id, venue_date, registration_name, venues, is_free_submission=False,
+                           approval_status='approved'):
+        """在一个事务中写入提交及其全部场地，失败时整体回滚，返回提交ID或None
+
+        venues 为 [{'number', 'time_slot', 'plus_one_name', 'screenshot'}, ...]。
+        """
+        try:
+            with transaction() as cursor:
+                submission_id = VenueSubmission._insert_with_venues(
+                    cursor, user_id, venue_date, registration_name, venues,
+                    is_free_submission, approval_status
+                )
+        except pymysql.Error as e:
+            print(f"Database query error: {e}", file=sys.stderr)
+            return None
+        finally:
+            occupancy_index.invalidate(venue_date)
+        return submission_id
+
+    @staticmethod
+    def _insert_with_venues(cursor, user_id, venue_date, registration_name, venues,
+                            is_free_submission=False, approval_status='approved'):
+        """在调用方的事务中插入提交（用 lastrowid 取ID）并 executemany 插入场地"""
+        cursor.execute('''
             INSERT INTO venue_submissions (user_id, venue_date, registration_name, is_free_submission, approval_status)
             VALUES (%s, %s, %s, %s, %s)
         ''', (user_id, venue_date, registration_name, is_free_submission, approval_status))
+        submission_id = cursor.lastrowid
         
-        if result and result > 0:
-            # Get the last inserted submission ID
-            last_id = execute_query('SELECT LAST_INSERT_ID()', fetch='one')
-            return last_id[0] if last_id else None
-        return None
+        if venues:
+            cursor.executemany('''
+                INSERT INTO venues (submission_id, venue_number, time_slot, plus_one_name, venue_screenshot)
+                VALUES (%s, %s, %s, %s, %s)
+            ''', [(submission_id, venue['number'], venue['time_slot'],
+                   venue.get('plus_one_name'), venue.get('screenshot')) for venue in venues])
+        return submission_id
 
     @staticmethod
     def get_by_user_id(user_id):
@@ -37,14 +71,8 @@ class VenueSubmission:
             ORDER BY venue_date DESC, upload_time DESC
         ''', (user_id,), fetch='all')
         
-        submissions = []
-        if results:
-            for row in results:
-                submission = VenueSubmission(*row)
-                # Load venues for this submission
-                submission.venues = Venue.get_by_submission_id(submission.id)
-                submissions.append(submission)
-        return submissions
+        submissions = [VenueSubmission(*row) for row in results] if results else []
+        return VenueSubmission.load_venues(submissions)
 
     @staticmethod
     def get_all_active(venue_date=None):
@@ -66,16 +94,49 @@ class VenueSubmission:
         
         results = execute_query(query, params, fetch='all')
         
-        submissions = []
-        if results:
-            for row in results:
-                submission = VenueSubmission(*row[:8])
-                submission.group_name = row[8]
-                submission.group_type = row[9]
-                # Load venues for this submission
-                submission.venues = Venue.get_by_submission_id(submission.id)
-                submissions.append(submission)
-        return submissions
+        submissions = VenueSubmission._from_rows_with_group(results)
+        return VenueSubmission.load_venues(submissions)
+
+    @staticmethod
+    def get_active_page(limit=20, offset=0, cursor=None, venue_date=None):
+        """分页获取活跃提交（按日期、上传时间、ID 倒序）
+
+        cursor 为上一页最后一条的 (venue_date, upload_time, id)，传入时使用键集分页，
+        忽略 offset；否则使用 limit/offset。
+        """
+        query = '''
+            SELECT vs.id, vs.user_id, vs.venue_date, vs.registration_name, 
+                   vs.is_free_submission, vs.upload_time, vs.status, vs.approval_status,
+                   u.group_name, u.group_type
+            FROM venue_submissions vs
+            JOIN users u ON vs.user_id = u.id
+            WHERE vs.status = "active" AND u.status = "approved"
+        '''
+        params = []
+        
+        if venue_date:
+            query += ' AND vs.venue_date = %s'
+            params.append(venue_date)
+        
+        if cursor:
+            query += ' AND (vs.venue_date, vs.upload_time, vs.id) < (%s, %s, %s)'
+            params.extend(cursor)
+        
+        query += ' ORDER BY vs.venue_date DESC, vs.upload_time DESC, vs.id DESC LIMIT %s'
+        params.append(int(limit))
+        
+        if offset and not cursor:
+            query += ' OFFSET %s'
+            params.append(int(offset))
+        
+        results = execute_query(query, params, fetch='all')
+        
+        submissions = VenueSubmission._from_rows_with_group(results)
+        return VenueSubmission.load_venues(submissions)
+
+    def get_cursor(self):
+        """键集分页游标：(venue_date, upload_time, id)"""
+        return (self.venue_date, self.upload_time, self.id)
 
     @staticmethod
     def get_by_id(submission_id):
@@ -102,6 +163,7 @@ class VenueSubmission:
             'UPDATE venue_submissions SET status = "deleted" WHERE id = %s',
             (submission_id,)
         )
+        occupancy_index.invalidate_all()
         return result is not None and result > 0
     
     @staticmethod
@@ -110,6 +172,7 @@ class VenueSubmission:
             'UPDATE venue_submissions SET approval_status = "approved" WHERE id = %s',
             (submission_id,)
         )
+        occupancy_index.invalidate_all()
         return result is not None and result > 0
     
     @staticmethod
@@ -124,14 +187,39 @@ class VenueSubmission:
             ORDER BY vs.upload_time ASC
         ''', fetch='all')
         
+        submissions = VenueSubmission._from_rows_with_group(results)
+        return VenueSubmission.load_venues(submissions)
+
+    @staticmethod
+    def count_pending_submissions():
+        """待审核提交数量（只做 COUNT，不加载数据）"""
+        result = execute_query('''
+            SELECT COUNT(*)
+            FROM venue_submissions vs
+            JOIN users u ON vs.user_id = u.id
+            WHERE vs.status = "active" AND vs.approval_status = "pending" AND u.status = "approved"
+        ''', fetch='one')
+        return result[0] if result else 0
+
+    @staticmethod
+    def _from_rows_with_group(rows):
+        """将带有 group_name/group_type 列的查询结果转换为提交对象"""
         submissions = []
-        if results:
-            for row in results:
-                submission = VenueSubmission(*row[:8])
-                submission.group_name = row[8]
-                submission.group_type = row[9]
-                submission.venues = Venue.get_by_submission_id(submission.id)
-                submissions.append(submission)
+        for row in rows or []:
+            submission = VenueSubmission(*row[:8])
+            submission.group_name = row[8]
+            submission.group_type = row[9]
+            submissions.append(submission)
+        return submissions
+
+    @staticmethod
+    def load_venues(submissions):
+        """一次查询批量加载多个提交的场地，避免逐条查询（N+1）"""
+        if not submissions:
+            return submissions
+        venues_by_submission = Venue.get_by_submission_ids([s.id for s in submissions])
+        for submission in submissions:
+            submission.venues = venues_by_submission.get(submission.id, [])
         return submissions
 
     def get_venue_count(self):
@@ -165,6 +253,7 @@ class Venue:
             INSERT INTO venues (submission_id, venue_number, time_slot, plus_one_name, venue_screenshot)
             VALUES (%s, %s, %s, %s, %s)
         ''', (submission_id, venue_number, time_slot, plus_one_name, venue_screenshot))
+        occupancy_index.invalidate_all()
         return result is not None and result > 0
 
     @staticmethod
@@ -176,24 +265,68 @@ class Venue:
         ''', (submission_id,), fetch='all')
         return [Venue(*row) for row in results] if results else []
 
+    @staticmethod
+    def get_by_submission_ids(submission_ids):
+        """批量获取多个提交的场地，返回 {submission_id: [Venue, ...]}"""
+        submission_ids = list(dict.fromkeys(submission_ids))
+        if not submission_ids:
+            return {}
+        
+        placeholders = ','.join(['%s'] * len(submission_ids))
+        results = execute_query(f'''
+            SELECT id, submission_id, venue_number, time_slot, plus_one_name, venue_screenshot
+            FROM venues WHERE submission_id IN ({placeholders})
+            ORDER BY submission_id, time_slot ASC, venue_number ASC
+        ''', tuple(submission_ids), fetch='all')
+        
+        venues_by_submission = {}
+        for row in results or []:
+            venues_by_submission.setdefault(row[1], []).append(Venue(*row))
+        return venues_by_submission
+
+    @staticmethod
+    def get_slot_info(venue_id):
+        """获取场地所在的 (venue_date, time_slot, venue_number)，不存在返回 None"""
+        result = execute_query('''
+            SELECT vs.venue_date, v.time_slot, v.venue_number FROM venues v
+            JOIN venue_submissions vs ON v.submission_id = vs.id
+            WHERE v.id = %s
+        ''', (venue_id,), fetch='one')
+        return tuple(result) if result else None
+
     @staticmethod
     def delete_venue(venue_id):
         result = execute_query('DELETE FROM venues WHERE id = %s', (venue_id,))
+        occupancy_index.invalidate_all()
         return result is not None and result > 0
         
     @staticmethod
     def get_occupied_venues(venue_date, time_slot):
-        """获取指定日期和时间段已被占用的场地号码"""
-        results = execute_query('''
-            SELECT v.venue_number
-            FROM venues v
-            JOIN venue_submissions vs ON v.submission_id = vs.id
-            JOIN users u ON vs.user_id = u.id
-            WHERE vs.venue_date = %s AND v.time_slot = %s 
-                  AND vs.status = "active" AND u.status = "approved"
-        ''', (venue_date, time_slot), fetch='all')
-        
-        return [row[0] for row in results] if results else []
+        """获取指定日期和时间段已被占用的场地号码（优先读取进程内占用索引）"""
+        mask = VenueManager.get_occupancy_masks(venue_date, [time_slot]).get(time_slot, 0)
+        return VenueManager.mask_to_numbers(mask)
+
+class SummaryVenue:
+    """场地汇总中的单条记录（使用 __slots__ 减少大量记录时的内存和构建开销）"""
+    __slots__ = ('venue_id', 'submission_id', 'venue_number', 'time_slot',
+                 'plus_one_name', 'screenshot', 'registration_name',
+                 'is_free_submission', 'group_name', 'group_type')
+
+    def __init__(self, venue_id, submission_id, venue_number, time_slot, plus_one_name,
+                 screenshot, registration_name, is_free_submission, group_name, group_type):
+        self.venue_id = venue_id
+        self.submission_id = submission_id
+        self.venue_number = venue_number
+        self.time_slot = time_slot
+        self.plus_one_name = plus_one_name
+        self.screenshot = screenshot
+        self.registration_name = registration_name
+        self.is_free_submission = is_free_submission
+        self.group_name = group_name
+        self.group_type = group_type
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
 
 # Utility functions for venue management
 class VenueManager:
@@ -203,55 +336,316 @@ class VenueManager:
         return Venue.get_occupied_venues(venue_date, time_slot)
 
     @staticmethod
-    def get_available_venue_numbers(venue_date, time_slot, max_venues=24):
-        """Get list of available venue numbers"""
-        occupied = VenueManager.get_occupied_venue_numbers(venue_date, time_slot)
+    def get_available_venue_numbers(venue_date, time_slot, max_venues=24, occupied=None):
+        """Get list of available venue numbers (pass occupied to avoid a second query)"""
+        if occupied is None:
+            occupied = VenueManager.get_occupied_venue_numbers(venue_date, time_slot)
+        occupied = set(occupied)
         available = [i for i in range(1, max_venues + 1) if i not in occupied]
         return available
 
     @staticmethod
-    def get_summary_by_date(venue_date):
-        """Get venue summary organized by time slots for a specific date"""
+    def _conflict_query(venue_date, pairs):
+        """构造一次性检查多个 (time_slot, venue_number) 占用情况的查询"""
+        pairs = list(dict.fromkeys(pairs))
+        placeholders = ','.join(['(%s, %s)'] * len(pairs))
+        query = f'''
+            SELECT v.time_slot, v.venue_number
+            FROM venues v
+            JOIN venue_submissions vs ON v.submission_id = vs.id
+            JOIN users u ON vs.user_id = u.id
+            WHERE vs.venue_date = %s AND (v.time_slot, v.venue_number) IN ({placeholders})
+                  AND vs.status = "active" AND u.status = "approved"
+        '''
+        params = [venue_date]
+        for time_slot, venue_number in pairs:
+            params.extend([time_slot, venue_number])
+        return query, tuple(params)
+
+    @staticmethod
+    def find_conflicts(venue_date, pairs):
+        """返回指定日期中已被占用的 (time_slot, venue_number) 集合（按占用位图判断）
+
+        查询失败时返回 None。
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return set()
+        masks = VenueManager.get_occupancy_masks(venue_date, {time_slot for time_slot, _ in pairs})
+        if masks is None:
+            return None
+        # 场地号从 1 开始，非正数不可能被占用（也避免负数移位）
+        return {(time_slot, number) for time_slot, number in pairs
+                if number >= 1 and masks.get(time_slot, 0) >> (number - 1) & 1}
+
+    @staticmethod
+    def book_venues(user_id, venue_date, registration_name, venues, is_free_submission=False,
+                    approval_status='approved'):
+        """原子地预订一次提交中的所有场地
+
+        venues 为 [{'number', 'time_slot', 'plus_one_name', 'screenshot'}, ...]。
+        在同一日期的命名锁内重新检查占用并在一个事务中写入提交和场地，
+        并发提交同一场地时只有一个会成功，其余返回冲突列表 [(time_slot, number), ...]。
+        """
+        requested = [(venue['time_slot'], venue['number']) for venue in venues]
+        duplicates = sorted({pair for pair in requested if requested.count(pair) > 1})
+        if duplicates:
+            return {'success': False, 'submission_id': None, 'conflicts': duplicates}
+        
+        try:
+            with booking_lock(venue_date):
+                with transaction() as cursor:
+                    cursor.execute(*VenueManager._conflict_query(venue_date, requested))
+                    occupied = set(cursor.fetchall())
+                    conflicts = [pair for pair in requested if pair in occupied]
+                    if conflicts:
+                        return {'success': False, 'submission_id': None, 'conflicts': conflicts}
+                    
+                    submission_id = VenueSubmission._insert_with_venues(
+                        cursor, user_id, venue_date, registration_name, venues,
+                        is_free_submission, approval_status
+                    )
+        except (pymysql.Error, LockTimeout) as e:
+            print(f"Venue booking error: {e}", file=sys.stderr)
+            return {'success': False, 'submission_id': None, 'conflicts': [], 'error': str(e)}
+        finally:
+            occupancy_index.invalidate(venue_date)
+        
+        return {'success': True, 'submission_id': submission_id, 'conflicts': []}
+
+    @staticmethod
+    def migrate_venue(venue_id, new_venue_number, new_time_slot, new_venue_date):
+        """在一个事务中把场地迁移到新的日期/时间段/场地号
+
+        持有目标日期的预订锁，并用 SELECT ... FOR UPDATE 锁定原场地行；原场地信息、
+        目标位置冲突和目标日期下可复用的提交在同一次查询中取得。跨日期且目标日期没有
+        同名提交时，复制原提交生成新提交。
+        返回 {'success': bool, 'error': 'not_found'|'conflict'|None, 'original': dict|None}，
+        数据库异常直接抛出（事务已回滚）。
+        """
+        with booking_lock(new_venue_date):
+            with transaction() as cursor:
+                cursor.execute('''
+                    SELECT v.id, v.venue_number, v.time_slot, v.plus_one_name, v.submission_id,
+                           vs.venue_date, vs.registration_name, u.group_name, u.group_type,
+                           (SELECT v2.id FROM venues v2
+                            JOIN venue_submissions vs2 ON v2.submission_id = vs2.id
+                            JOIN users u2 ON vs2.user_id = u2.id
+                            WHERE vs2.venue_date = %s AND v2.time_slot = %s AND v2.venue_number = %s
+                                  AND v2.id != v.id AND vs2.status = "active" AND u2.status = "approved"
+                            LIMIT 1) AS conflict_id,
+                           (SELECT vs3.id FROM venue_submissions vs3
+                            WHERE vs3.venue_date = %s AND vs3.user_id = vs.user_id
+                                  AND vs3.registration_name = vs.registration_name AND vs3.status = "active"
+                            ORDER BY vs3.id LIMIT 1) AS target_submission_id
+                    FROM venues v
+                    JOIN venue_submissions vs ON v.submission_id = vs.id
+                    JOIN users u ON vs.user_id = u.id
+                    WHERE v.id = %s
+                    FOR UPDATE
+                ''', (new_venue_date, new_time_slot, new_venue_number, new_venue_date, venue_id))
+                row = cursor.fetchone()
+                if not row:
+                    return {'success': False, 'error': 'not_found', 'original': None}
+                
+                original = {
+                    'venue_number': row[1],
+                    'time_slot': row[2],
+                    'submission_id': row[4],
+                    'venue_date': row[5],
+                    'registration_name': row[6],
+                    'group_name': row[7],
+                    'group_type': row[8]
+                }
+                if row[9]:
+                    return {'success': False, 'error': 'conflict', 'original': original}
+                
+                if str(new_venue_date) == str(original['venue_date']):
+                    # 同日期迁移，只更新场地号和时间段
+                    new_submission_id = original['submission_id']
+                elif row[10]:
+                    # 目标日期已有同用户同报名名称的提交，直接归入
+                    new_submission_id = row[10]
+                else:
+                    # 复制原提交到目标日期
+                    cursor.execute('''
+                        INSERT INTO venue_submissions (user_id, venue_date, registration_name, is_free_submission, status, approval_status)
+                        SELECT user_id, %s, registration_name, is_free_submission, 'active', 'approved'
+                        FROM venue_submissions WHERE id = %s
+                    ''', (new_venue_date, original['submission_id']))
+                    new_submission_id = cursor.lastrowid
+                
+                cursor.execute('''
+                    UPDATE venues SET venue_number = %s, time_slot = %s, submission_id = %s WHERE id = %s
+                ''', (new_venue_number, new_time_slot, new_submission_id, venue_id))
+        
+        occupancy_index.invalidate([original['venue_date'], new_venue_date])
+        return {'success': True, 'error': None, 'original': original}
+
+    @staticmethod
+    def apply_moves(venue_date, moves):
+        """在一个事务中批量调整同一日期内的场地（支持互换和循环调整）
+
+        moves 为 [(venue_id, new_time_slot, new_venue_number), ...]。持有该日期的预订锁，
+        一次查询锁定并读取当天全部占用作为快照，在内存中按“全部移动完成后”的状态校验
+        被移动场地的目标位置，因此互换/循环不会因逐个应用而误报冲突；校验通过后 executemany 一次写入。
+        返回 {'success', 'error': 'not_found'|'conflict'|None, 'missing', 'conflicts', 'freed', 'booked'}。
+        """
+        with booking_lock(venue_date):
+            with transaction() as cursor:
+                cursor.execute('''
+                    SELECT v.id, v.time_slot, v.venue_number
+                    FROM venues v
+                    JOIN venue_submissions vs ON v.submission_id = vs.id
+                    JOIN users u ON vs.user_id = u.id
+                    WHERE vs.venue_date = %s AND vs.status = "active" AND u.status = "approved"
+                    FOR UPDATE
+                ''', (venue_date,))
+                positions = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+                
+                missing = [venue_id for venue_id, _, _ in moves if venue_id not in positions]
+                if missing:
+                    return {'success': False, 'error': 'not_found', 'missing': missing, 'conflicts': []}
+                
+                targets = {}
+                for venue_id, time_slot, venue_number in moves:
+                    targets[venue_id] = (time_slot, venue_number)
+                changed = [(venue_id, time_slot, venue_number) for venue_id, (time_slot, venue_number) in targets.items()
+                           if positions[venue_id] != (time_slot, venue_number)]
+                
+                # 只校验被移动场地的目标位置：与其他移动目标重复，或与未移动的场地重叠。
+                # 当天未涉及的场地之间已有的重复（历史数据等）不影响本次调整
+                moved_ids = {venue_id for venue_id, _, _ in changed}
+                stationary = {position for venue_id, position in positions.items() if venue_id not in moved_ids}
+                seen = set()
+                conflicts = set()
+                for _, time_slot, venue_number in changed:
+                    position = (time_slot, venue_number)
+                    if position in seen or position in stationary:
+                        conflicts.add(position)
+                    seen.add(position)
+                if conflicts:
+                    return {'success': False, 'error': 'conflict', 'missing': [], 'conflicts': sorted(conflicts)}
+                if changed:
+                    cursor.executemany(
+                        'UPDATE venues SET time_slot = %s, venue_number = %s WHERE id = %s',
+                        [(time_slot, venue_number, venue_id) for venue_id, time_slot, venue_number in changed]
+                    )
+        
+        occupancy_index.invalidate(venue_date)
+        return {
+            'success': True,
+            'error': None,
+            'missing': [],
+            'conflicts': [],
+            'freed': [positions[venue_id] for venue_id, _, _ in changed],
+            'booked': [(time_slot, venue_number) for _, time_slot, venue_number in changed]
+        }
+
+    @staticmethod
+    def get_occupancy_masks(venue_date, time_slots):
+        """获取某日期若干时间段的占用位图 {time_slot: mask}
+
+        命中进程内索引的时间段直接返回，其余时间段一次查询补齐并写回索引。
+        查询失败时返回 None。
+        """
+        masks = {}
+        missing = []
+        for time_slot in time_slots:
+            mask = occupancy_index.get(venue_date, time_slot)
+            if mask is None:
+                missing.append(time_slot)
+            else:
+                masks[time_slot] = mask
+        if not missing:
+            return masks
+        
+        version = occupancy_index.version(venue_date)
+        placeholders = ','.join(['%s'] * len(missing))
+        results = execute_query(f'''
+            SELECT v.time_slot, BIT_OR(1 << (v.venue_number - 1))
+            FROM venues v
+            JOIN venue_submissions vs ON v.submission_id = vs.id
+            JOIN users u ON vs.user_id = u.id
+            WHERE vs.venue_date = %s AND v.time_slot IN ({placeholders})
+                  AND vs.status = "active" AND u.status = "approved"
+            GROUP BY v.time_slot
+        ''', (venue_date, *missing), fetch='all')
+        if results is None:
+            return None
+        
+        fetched = {time_slot: int(mask) for time_slot, mask in results}
+        for time_slot in missing:
+            masks[time_slot] = fetched.get(time_slot, 0)
+            occupancy_index.put(venue_date, time_slot, masks[time_slot], version)
+        return masks
+
+    @staticmethod
+    def get_occupancy_matrix(start_date, end_date):
+        """一次查询获取日期范围内每个 (日期, 时间段) 的场地占用位图
+
+        返回 {date: {time_slot: mask}}，场地 n 被占用时 mask 的第 n-1 位为 1。
+        """
+        results = execute_query('''
+            SELECT vs.venue_date, v.time_slot, BIT_OR(1 << (v.venue_number - 1))
+            FROM venues v
+            JOIN venue_submissions vs ON v.submission_id = vs.id
+            JOIN users u ON vs.user_id = u.id
+            WHERE vs.venue_date BETWEEN %s AND %s
+                  AND vs.status = "active" AND u.status = "approved"
+            GROUP BY vs.venue_date, v.time_slot
+        ''', (start_date, end_date), fetch='all')
+        
+        matrix = {}
+        for venue_date, time_slot, mask in results or []:
+            matrix.setdefault(venue_date, {})[time_slot] = int(mask)
+        return matrix
+
+    @staticmethod
+    def mask_to_numbers(mask, max_venues=24):
+        """将占用位图还原为场地号列表"""
+        return [number for number in range(1, max_venues + 1) if mask >> (number - 1) & 1]
+
+    @staticmethod
+    def get_summary_by_date(venue_date, compact=False):
+        """Get venue summary organized by time slots for a specific date
+
+        整个日期只查询一次，再按时间段分组。compact=True 时每个场地为 SummaryVenue
+        （__slots__ 记录，模板中可按属性访问），否则为字典。
+        """
         from flask import current_app
         time_slots = current_app.config['TIME_SLOTS']
         
         summary = {}
         for slot_key, slot_name in time_slots:
-            # Get all venues for this time slot and date
-            results = execute_query('''
-                SELECT v.id, v.submission_id, v.venue_number, v.time_slot, 
-                       v.plus_one_name, v.venue_screenshot,
-                       vs.registration_name, vs.is_free_submission,
-                       u.group_name, u.group_type
-                FROM venues v
-                JOIN venue_submissions vs ON v.submission_id = vs.id
-                JOIN users u ON vs.user_id = u.id
-                WHERE vs.venue_date = %s AND v.time_slot = %s 
-                      AND vs.status = "active" AND vs.approval_status = "approved" AND u.status = "approved"
-                ORDER BY v.venue_number ASC
-            ''', (venue_date, slot_key), fetch='all')
-            
-            venues_list = []
-            if results:
-                for row in results:
-                    venues_list.append({
-                        'venue_id': row[0],
-                        'submission_id': row[1],
-                        'venue_number': row[2],
-                        'time_slot': row[3],
-                        'plus_one_name': row[4],
-                        'screenshot': row[5],
-                        'registration_name': row[6],
-                        'is_free_submission': row[7],
-                        'group_name': row[8],
-                        'group_type': row[9]
-                    })
-            
             summary[slot_key] = {
                 'name': slot_name,
-                'venues': venues_list,
-                'count': len(venues_list)
+                'venues': [],
+                'count': 0
             }
+        if not summary:
+            return summary
+        
+        placeholders = ','.join(['%s'] * len(summary))
+        results = execute_query(f'''
+            SELECT v.id, v.submission_id, v.venue_number, v.time_slot, 
+                   v.plus_one_name, v.venue_screenshot,
+                   vs.registration_name, vs.is_free_submission,
+                   u.group_name, u.group_type
+            FROM venues v
+            JOIN venue_submissions vs ON v.submission_id = vs.id
+            JOIN users u ON vs.user_id = u.id
+            WHERE vs.venue_date = %s AND v.time_slot IN ({placeholders})
+                  AND vs.status = "active" AND vs.approval_status = "approved" AND u.status = "approved"
+            ORDER BY v.time_slot ASC, v.venue_number ASC
+        ''', (venue_date, *summary.keys()), fetch='all')
+        
+        for row in results or []:
+            record = SummaryVenue(*row)
+            summary[record.time_slot]['venues'].append(record if compact else record.to_dict())
+        
+        for slot_data in summary.values():
+            slot_data['count'] = len(slot_data['venues'])
         
         return summary
         
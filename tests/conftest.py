@@ -0,0 +1,117 @@
+import os
+import uuid
+from datetime import date, datetime
+
+import pytest
+from flask import Flask
+
+from config import Config
+from utils.database import close_db, execute_query, init_db
+
+
+@pytest.fixture
+def app():
+    """只加载配置的最小应用（不调用 create_app，不连接数据库）"""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['USER_STATS_CACHE_TTL'] = 0
+    with app.app_context():
+        yield app
+
+
+class FakeQueries:
+    """替换 execute_query 的计数桩：记录每条 SQL，并按 SQL 返回构造的结果"""
+
+    def __init__(self, submissions, venues_per_submission=3):
+        self.submissions = submissions
+        self.venues_per_submission = venues_per_submission
+        self.queries = []
+
+    def __call__(self, query, params=None, fetch=False):
+        sql = ' '.join(query.split())
+        self.queries.append(sql)
+        if 'FROM venues WHERE submission_id IN' in sql:
+            return [(submission_id * 100 + k, submission_id, k + 1, '12:00-13:00', None, None)
+                    for submission_id in params for k in range(self.venues_per_submission)]
+        if 'FROM venue_submissions' in sql and fetch == 'all':
+            rows = [(i, 1, date(2024, 1, 1), f'name{i}', False, datetime(2024, 1, 1, 12, 0), 'active',
+                     'approved', f'group{i}', 'A') for i in range(1, self.submissions + 1)]
+            if 'group_name' not in sql:
+                rows = [row[:8] for row in rows]
+            return rows
+        if 'FROM venues v' in sql and fetch == 'all':
+            return [(i, i, i % 24 + 1, '12:00-13:00', None, None, f'name{i}', False, 'group', 'A')
+                    for i in range(1, self.submissions + 1)]
+        if fetch == 'one':
+            return (0,) * 32
+        return []
+
+
+@pytest.fixture
+def fake_queries(monkeypatch):
+    """返回工厂：fake_queries(n) 安装一个模拟 n 条提交的计数桩"""
+    def install(submissions, venues_per_submission=3):
+        fake = FakeQueries(submissions, venues_per_submission)
+        import models.venue
+        import models.user
+        monkeypatch.setattr(models.venue, 'execute_query', fake)
+        monkeypatch.setattr(models.user, 'execute_query', fake)
+        return fake
+    return install
+
+
+def mysql_test_settings():
+    """TEST_MYSQL_* 环境变量指定的测试库；未设置时返回 None（相关测试跳过）"""
+    host = os.getenv('TEST_MYSQL_HOST')
+    database = os.getenv('TEST_MYSQL_DB')
+    if not host or not database:
+        return None
+    settings = {
+        'MYSQL_HOST': host,
+        'MYSQL_PORT': int(os.getenv('TEST_MYSQL_PORT', 3306)),
+        'MYSQL_USER': os.getenv('TEST_MYSQL_USER', 'root'),
+        'MYSQL_PASSWORD': os.getenv('TEST_MYSQL_PASSWORD', ''),
+        'MYSQL_DB': database,
+    }
+    if (host, database) == (Config.MYSQL_HOST, Config.MYSQL_DB):
+        raise RuntimeError('TEST_MYSQL_* points at the production database; use a dedicated test database')
+    return settings
+
+
+@pytest.fixture(scope='session')
+def mysql_app():
+    """连接测试库的应用（已执行迁移），连接池足够容纳并发测试的线程"""
+    settings = mysql_test_settings()
+    if settings is None:
+        pytest.skip('TEST_MYSQL_HOST/TEST_MYSQL_DB not set')
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(settings, MYSQL_POOL_SIZE=40, MYSQL_POOL_MAX_OVERFLOW=20, USER_STATS_CACHE_TTL=0)
+    app.teardown_appcontext(close_db)
+    with app.app_context():
+        init_db()
+    yield app
+    app.extensions['mysql_pool'].close_all()
+
+
+@pytest.fixture
+def make_group(mysql_app):
+    """返回工厂：make_group() 插入一个已审核的测试组并返回 user_id，测试结束后级联删除"""
+    user_ids = []
+
+    def create(status='approved'):
+        group_name = f'test-{uuid.uuid4().hex[:12]}'
+        with mysql_app.app_context():
+            execute_query('''
+                INSERT INTO users (group_type, group_name, password_hash, status)
+                VALUES (%s, %s, %s, %s)
+            ''', ('A', group_name, 'x', status))
+            user_id = execute_query('SELECT id FROM users WHERE group_name = %s', (group_name,), fetch='one')[0]
+        user_ids.append(user_id)
+        return user_id
+
+    yield create
+    if user_ids:
+        with mysql_app.app_context():
+            placeholders = ', '.join(['%s'] * len(user_ids))
+            execute_query(f'DELETE FROM users WHERE id IN ({placeholders})', user_ids)
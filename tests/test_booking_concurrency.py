@@ -0,0 +1,98 @@
+"""并发预订压力测试：大量提交者同时抢同一批场地，不产生任何重复预订（需要 MySQL）"""
+import random
+import threading
+from collections import Counter
+from datetime import date, timedelta
+
+import pytest
+
+from models.user import User
+from models.venue import VenueManager
+from utils.database import execute_query
+
+BASE_DATE = date(2099, 9, 1)
+SUBMITTERS = 20
+ROUNDS = 5
+TIME_SLOT = '12:00-13:00'
+
+
+def run_submitters(app, user_ids, venue_date, requests):
+    """每个线程使用独立的应用上下文（独立连接），在屏障处同时调用 book_venues
+
+    调用前先像 venue_form 一样读取用户和占用情况，使连接上留有加锁前的读快照。
+    """
+    barrier = threading.Barrier(len(requests))
+    results = [None] * len(requests)
+    errors = []
+
+    def submit(index):
+        try:
+            with app.app_context():
+                User.find_by_id(user_ids[index])
+                VenueManager.find_conflicts(venue_date, [(venue['time_slot'], venue['number'])
+                                                         for venue in requests[index]])
+                barrier.wait()
+                results[index] = VenueManager.book_venues(
+                    user_ids[index], venue_date, f'stress-{index}', requests[index]
+                )
+        except Exception as e:  # 线程内异常汇总到主线程断言
+            errors.append(e)
+
+    threads = [threading.Thread(target=submit, args=(index,)) for index in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+    assert not errors
+    return results
+
+
+def booked_pairs(app, venue_date):
+    with app.app_context():
+        rows = execute_query('''
+            SELECT v.time_slot, v.venue_number
+            FROM venues v
+            JOIN venue_submissions vs ON v.submission_id = vs.id
+            WHERE vs.venue_date = %s AND vs.status = "active"
+        ''', (venue_date,), fetch='all')
+    return [(row[0], row[1]) for row in rows]
+
+
+@pytest.fixture
+def submitters(mysql_app, make_group):
+    return [make_group() for _ in range(SUBMITTERS)]
+
+
+@pytest.mark.parametrize('round_index', range(ROUNDS))
+def test_same_court_is_booked_exactly_once(mysql_app, submitters, round_index):
+    venue_date = BASE_DATE + timedelta(days=round_index)
+    requests = [[{'number': 7, 'time_slot': TIME_SLOT}] for _ in submitters]
+
+    results = run_submitters(mysql_app, submitters, venue_date, requests)
+
+    assert sum(1 for result in results if result['success']) == 1
+    for result in results:
+        if not result['success']:
+            assert result['conflicts'] == [(TIME_SLOT, 7)]
+            assert 'error' not in result
+    assert booked_pairs(mysql_app, venue_date) == [(TIME_SLOT, 7)]
+
+
+def test_overlapping_multi_court_requests_never_double_book(mysql_app, submitters):
+    venue_date = BASE_DATE + timedelta(days=ROUNDS)
+    time_slots = [slot for slot, _ in mysql_app.config['TIME_SLOTS']]
+    pool = [(slot, number) for slot in time_slots for number in range(1, 5)]
+    rng = random.Random(20990901)
+    requests = [[{'number': number, 'time_slot': slot} for slot, number in rng.sample(pool, 3)]
+                for _ in submitters]
+
+    results = run_submitters(mysql_app, submitters, venue_date, requests)
+
+    booked = booked_pairs(mysql_app, venue_date)
+    assert not [pair for pair, count in Counter(booked).items() if count > 1]
+    # 每个成功的提交完整写入，失败的提交一个场地也没有写入
+    expected = [(venue['time_slot'], venue['number'])
+                for request, result in zip(requests, results) if result['success'] for venue in request]
+    assert sorted(booked) == sorted(expected)
+    assert any(result['success'] for result in results)
+    assert all(result['success'] or result['conflicts'] for result in results)
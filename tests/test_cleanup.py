@@ -0,0 +1,21 @@
+"""过期数据清理：每个场地一行读取截图，截图多、文件名长时也不会被截断"""
+from datetime import date
+
+import utils.cleanup
+from utils.cleanup import DataCleanup
+
+
+def test_expired_submissions_keep_every_screenshot(monkeypatch):
+    # 40 个 sha256 文件名远超 GROUP_CONCAT 默认的 1024 字节
+    screenshots = [f'{index:064x}.png' for index in range(40)]
+    rows = [(1, date(2024, 1, 1), 'team', name) for name in screenshots]
+    rows += [(2, date(2024, 1, 1), None, None), (3, date(2023, 12, 31), 'solo', 'None')]
+    monkeypatch.setattr(utils.cleanup, 'execute_query', lambda query, params=None, fetch=False: rows)
+
+    expired = DataCleanup.get_expired_submissions()
+
+    assert [submission['submission_id'] for submission in expired] == [1, 2, 3]
+    assert expired[0]['screenshots'] == screenshots
+    assert expired[1] == {'submission_id': 2, 'venue_date': '2024-01-01',
+                          'registration_name': 'Unknown', 'screenshots': []}
+    assert expired[2]['screenshots'] == []
@@ -0,0 +1,55 @@
+"""场地变更推送：订阅上限、推送连接的最长时长，以及由共享占用版本驱动的跨 worker 推送"""
+import json
+
+from utils.events import BookingEventBroker
+from utils.occupancy import occupancy_index
+
+
+def test_subscribe_rejects_beyond_limit():
+    broker = BookingEventBroker(max_subscribers=2)
+    first = broker.subscribe('2024-01-01')
+    assert broker.subscribe('2024-01-02') is not None
+    assert broker.subscribe('2024-01-01') is None
+
+    broker.unsubscribe(first)
+    assert broker.subscribe('2024-01-01') is not None
+
+
+def test_stream_ends_with_reset_after_max_duration():
+    broker = BookingEventBroker(max_subscribers=1)
+    subscription = broker.subscribe('2024-01-01')
+    broker.publish('2024-01-01', 1)
+
+    events = list(broker.stream(subscription, heartbeat=0.01, max_duration=0.05))
+
+    assert events[0].startswith('retry:')
+    assert events[1].startswith('event: change')
+    assert events[-1].startswith('event: reset')
+    # 连接结束后释放订阅名额
+    assert broker.stats()['subscribers'] == 0
+
+
+def test_poll_publishes_when_another_worker_bumps_the_version(monkeypatch):
+    versions = {'*': 0, '2024-01-01': 4, '2024-01-02': 0}
+    monkeypatch.setattr(occupancy_index, 'shared_versions',
+                        lambda dates: {scope: versions[scope] for scope in ['*', *dates]})
+    broker = BookingEventBroker(max_subscribers=2)
+    watched = broker.subscribe('2024-01-01')
+    other = broker.subscribe('2024-01-02')
+
+    # 首次读取只作为基线
+    broker.poll()
+    assert watched.queue.empty()
+
+    versions['2024-01-01'] = 5
+    broker.poll()
+    broker.poll()
+    assert json.loads(watched.queue.get_nowait()) == {'date': '2024-01-01', 'version': 5}
+    assert watched.queue.empty()
+    assert other.queue.empty()
+
+    # 全局失效（invalidate_all）通知所有日期
+    versions['*'] = 1
+    broker.poll()
+    assert not watched.queue.empty()
+    assert not other.queue.empty()
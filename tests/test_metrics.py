@@ -0,0 +1,63 @@
+"""多 worker 指标汇总：存活进程求和，已退出进程的累计值并入 retired.json"""
+import json
+import os
+
+from utils.metrics import MetricsRegistry, MultiprocessMetrics
+
+DEAD_PID = 2 ** 31 - 1
+
+
+def make_registry(requests, connections, latency=None):
+    registry = MetricsRegistry()
+    registry.counter('requests_total', 'Requests', ('status',)).inc(requests, labels=('200',))
+    registry.gauge('connections', 'Open connections', lambda: connections)
+    histogram = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    for value in latency or []:
+        histogram.observe(value)
+    return registry
+
+
+def write_worker(directory, pid, registry):
+    with open(os.path.join(directory, f'metrics-{pid}.json'), 'w') as f:
+        json.dump(registry.snapshot(), f)
+
+
+def samples(text):
+    return dict(line.rsplit(' ', 1) for line in text.splitlines() if line and not line.startswith('#'))
+
+
+def test_single_process_render_is_unchanged_by_snapshots():
+    text = make_registry(2, 5, latency=[0.05, 0.5]).render()
+    values = samples(text)
+    assert values['requests_total{status="200"}'] == '2'
+    assert values['connections'] == '5'
+    assert values['latency_seconds_bucket{le="0.1"}'] == '1'
+    assert values['latency_seconds_bucket{le="+Inf"}'] == '2'
+    assert '# TYPE latency_seconds histogram' in text
+
+
+def test_live_workers_are_summed(tmp_path):
+    store = MultiprocessMetrics(make_registry(2, 5, latency=[0.05]), str(tmp_path))
+    write_worker(str(tmp_path), os.getppid(), make_registry(3, 4, latency=[0.5]))
+
+    values = samples(store.render())
+
+    assert values['requests_total{status="200"}'] == '5'
+    assert values['connections'] == '9'
+    assert values['latency_seconds_count'] == '2'
+    assert values['latency_seconds_bucket{le="0.1"}'] == '1'
+
+
+def test_exited_workers_keep_counters_but_not_gauges(tmp_path):
+    store = MultiprocessMetrics(make_registry(2, 5), str(tmp_path))
+    write_worker(str(tmp_path), DEAD_PID, make_registry(10, 7, latency=[0.05]))
+
+    first = samples(store.render())
+    second = samples(store.render())
+
+    for values in (first, second):
+        assert values['requests_total{status="200"}'] == '12'
+        assert values['connections'] == '5'
+        assert values['latency_seconds_count'] == '1'
+    assert not os.path.exists(tmp_path / f'metrics-{DEAD_PID}.json')
+    assert os.path.exists(tmp_path / 'retired.json')
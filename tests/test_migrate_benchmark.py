@@ -0,0 +1,124 @@
+"""admin_migrate_venue 改造前后的延迟基准（需要 MySQL）
+
+旧实现是路由内七次独立提交的 execute_query（取原场地、冲突检查、查同名提交、查用户、
+INSERT…SELECT、LAST_INSERT_ID、UPDATE），新实现是 VenueManager.migrate_venue 的单个加锁事务。
+"""
+import statistics
+import time
+from datetime import date, timedelta
+
+from flask import g
+
+from models.venue import VenueManager
+from utils.database import execute_query
+
+SOURCE_DATE = date(2099, 11, 1)
+VENUES = 24
+TIME_SLOT = '12:00-13:00'
+
+
+def legacy_migrate_venue(venue_id, new_venue_number, new_time_slot, new_venue_date):
+    """改造前的迁移流程（取自原 admin_migrate_venue 路由，去掉请求解析和响应）"""
+    original_venue = execute_query('''
+        SELECT v.id, v.venue_number, v.time_slot, v.plus_one_name, v.submission_id,
+               vs.venue_date, vs.registration_name, u.group_name, u.group_type
+        FROM venues v
+        JOIN venue_submissions vs ON v.submission_id = vs.id
+        JOIN users u ON vs.user_id = u.id
+        WHERE v.id = %s
+    ''', (venue_id,), fetch='one')
+    if not original_venue:
+        return False
+
+    conflict = execute_query('''
+        SELECT v.id FROM venues v
+        JOIN venue_submissions vs ON v.submission_id = vs.id
+        WHERE v.venue_number = %s AND v.time_slot = %s AND vs.venue_date = %s
+        AND v.id != %s AND vs.status = 'active'
+    ''', (new_venue_number, new_time_slot, new_venue_date, venue_id), fetch='one')
+    if conflict:
+        return False
+
+    if str(new_venue_date) != str(original_venue[5]):
+        existing_submission = execute_query('''
+            SELECT vs.id FROM venue_submissions vs
+            JOIN users u ON vs.user_id = u.id
+            WHERE vs.venue_date = %s AND vs.registration_name = %s
+            AND u.group_name = %s AND vs.status = 'active'
+        ''', (new_venue_date, original_venue[6], original_venue[7]), fetch='one')
+        if existing_submission:
+            new_submission_id = existing_submission[0]
+        else:
+            execute_query('''
+                SELECT u.id FROM users u
+                JOIN venue_submissions vs ON vs.user_id = u.id
+                WHERE vs.id = %s
+            ''', (original_venue[4],), fetch='one')
+            execute_query('''
+                INSERT INTO venue_submissions (user_id, venue_date, registration_name, is_free_submission, status, approval_status)
+                SELECT user_id, %s, registration_name, is_free_submission, 'active', 'approved'
+                FROM venue_submissions WHERE id = %s
+            ''', (new_venue_date, original_venue[4]))
+            new_submission_id = execute_query('SELECT LAST_INSERT_ID()', fetch='one')[0]
+        execute_query('''
+            UPDATE venues SET venue_number = %s, time_slot = %s, submission_id = %s WHERE id = %s
+        ''', (new_venue_number, new_time_slot, new_submission_id, venue_id))
+    else:
+        execute_query('''
+            UPDATE venues SET venue_number = %s, time_slot = %s WHERE id = %s
+        ''', (new_venue_number, new_time_slot, venue_id))
+    return True
+
+
+def seed_venues(app, user_id, venue_date, name):
+    """一个提交下 VENUES 个场地，返回场地 id 列表"""
+    venues = [{'number': number, 'time_slot': TIME_SLOT} for number in range(1, VENUES + 1)]
+    with app.app_context():
+        result = VenueManager.book_venues(user_id, venue_date, name, venues)
+        assert result['success']
+        rows = execute_query('SELECT id FROM venues WHERE submission_id = %s ORDER BY venue_number',
+                             (result['submission_id'],), fetch='all')
+    return [row[0] for row in rows]
+
+
+def measure(app, migrate, venue_ids, target_date):
+    """逐个把场地跨日期迁移（首个新建提交，其余归入该提交），返回 (每次耗时, 每次语句数)"""
+    timings, statements = [], []
+    for index, venue_id in enumerate(venue_ids):
+        with app.app_context():
+            g.db_query_count = 0
+            started = time.perf_counter()
+            migrate(venue_id, VENUES - index, TIME_SLOT, target_date)
+            timings.append(time.perf_counter() - started)
+            statements.append(g.db_query_count)
+    return timings, statements
+
+
+def test_migrate_venue_latency_before_after(mysql_app, make_group, capsys):
+    user_id = make_group()
+    legacy_ids = seed_venues(mysql_app, user_id, SOURCE_DATE, 'bench-legacy')
+    current_ids = seed_venues(mysql_app, user_id, SOURCE_DATE + timedelta(days=1), 'bench-current')
+
+    legacy_times, legacy_statements = measure(mysql_app, legacy_migrate_venue, legacy_ids,
+                                              SOURCE_DATE + timedelta(days=10))
+    current_times, current_statements = measure(mysql_app, VenueManager.migrate_venue, current_ids,
+                                                SOURCE_DATE + timedelta(days=11))
+
+    with capsys.disabled():
+        print(f'\nbenchmark migrate_venue over {VENUES} cross-date moves: '
+              f'legacy median {statistics.median(legacy_times) * 1000:.2f}ms '
+              f'({max(legacy_statements)} statements max), '
+              f'transactional median {statistics.median(current_times) * 1000:.2f}ms '
+              f'({max(current_statements)} statements max)')
+
+    with mysql_app.app_context():
+        moved = execute_query('''
+            SELECT COUNT(*), COUNT(DISTINCT v.submission_id)
+            FROM venues v JOIN venue_submissions vs ON v.submission_id = vs.id
+            WHERE vs.venue_date = %s
+        ''', (SOURCE_DATE + timedelta(days=11),), fetch='one')
+    assert tuple(moved) == (VENUES, 1)
+    # GET_LOCK、加锁读取（含冲突检查和目标提交查找）、（必要时）插入提交、更新场地、RELEASE_LOCK，
+    # 以及提交后一次递增两个日期的共享占用版本
+    assert max(current_statements) <= 6
+    assert max(current_statements) < max(legacy_statements)
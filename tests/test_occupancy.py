@@ -0,0 +1,87 @@
+"""占用索引的共享版本：ETag 跨进程一致，其他进程写入后本进程缓存失效"""
+import pytest
+
+import utils.occupancy
+from utils.occupancy import OccupancyIndex
+
+
+class SharedVersions:
+    """模拟 occupancy_versions 表（两个 OccupancyIndex 实例代表两个 worker 进程）"""
+
+    def __init__(self):
+        self.versions = {}
+        self.available = True
+        self.bumps = 0
+
+    def __call__(self, query, params=None, fetch=False):
+        if not self.available:
+            return None
+        if query.lstrip().startswith('INSERT'):
+            self.bumps += 1
+            for scope in params:
+                self.versions[scope] = self.versions.get(scope, 0) + 1
+            return len(params)
+        return [(scope, self.versions[scope]) for scope in params if scope in self.versions]
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    store = SharedVersions()
+    monkeypatch.setattr(utils.occupancy, 'execute_query', store)
+    return store
+
+
+def test_etag_is_identical_across_workers_and_stable(shared):
+    worker_a, worker_b = OccupancyIndex(), OccupancyIndex()
+
+    assert worker_a.etag('2024-01-01', 'exchange') == worker_b.etag('2024-01-01', 'exchange')
+    assert worker_a.etag('2024-01-01', 'exchange') == worker_a.etag('2024-01-01', 'exchange')
+    assert worker_a.etag('2024-01-01', 'exchange') != worker_a.etag('2024-01-01', 'available')
+
+
+def test_write_on_one_worker_changes_etag_everywhere(shared):
+    worker_a, worker_b = OccupancyIndex(), OccupancyIndex()
+    before = worker_b.etag(['2024-01-01', '2024-01-02'])
+
+    worker_a.invalidate('2024-01-02')
+
+    assert worker_b.etag(['2024-01-01', '2024-01-02']) != before
+    assert worker_a.etag(['2024-01-01', '2024-01-02']) == worker_b.etag(['2024-01-01', '2024-01-02'])
+
+
+def test_invalidating_several_dates_bumps_them_in_one_statement(shared):
+    worker_a, worker_b = OccupancyIndex(), OccupancyIndex()
+    before = {day: worker_b.etag(day) for day in ('2024-01-01', '2024-01-02')}
+
+    worker_a.invalidate(['2024-01-01', '2024-01-02', '2024-01-01'])
+
+    assert shared.bumps == 1
+    assert shared.versions == {'2024-01-01': 1, '2024-01-02': 1}
+    assert all(worker_b.etag(day) != etag for day, etag in before.items())
+
+
+def test_invalidate_all_changes_every_date(shared):
+    worker_a, worker_b = OccupancyIndex(), OccupancyIndex()
+    before = worker_b.etag('2024-01-01')
+
+    worker_a.invalidate_all()
+
+    assert worker_b.etag('2024-01-01') != before
+
+
+def test_other_worker_write_drops_local_cache_entries(shared):
+    worker_a, worker_b = OccupancyIndex(), OccupancyIndex()
+    worker_b.etag('2024-01-01')
+    worker_b.put('2024-01-01', '12:00-13:00', 0b1)
+    worker_b.put('2024-01-02', '12:00-13:00', 0b10)
+
+    worker_a.invalidate('2024-01-01')
+    worker_b.etag('2024-01-01')
+
+    assert worker_b.get('2024-01-01', '12:00-13:00') is None
+    assert worker_b.get('2024-01-02', '12:00-13:00') == 0b10
+
+
+def test_etag_is_none_when_versions_unavailable(shared):
+    shared.available = False
+    assert OccupancyIndex().etag('2024-01-01') is None
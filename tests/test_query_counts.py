@@ -0,0 +1,55 @@
+"""列表方法的查询次数回归测试：查询次数不随提交数量增长（无 N+1）"""
+import pytest
+
+from models.user import User
+from models.venue import VenueManager, VenueSubmission
+
+
+LIST_METHODS = [
+    ('get_by_user_id', lambda: VenueSubmission.get_by_user_id(1)),
+    ('get_all_active', lambda: VenueSubmission.get_all_active()),
+    ('get_active_page', lambda: VenueSubmission.get_active_page(limit=50)),
+    ('get_pending_submissions', lambda: VenueSubmission.get_pending_submissions()),
+]
+
+
+@pytest.mark.parametrize('name,call', LIST_METHODS, ids=[name for name, _ in LIST_METHODS])
+@pytest.mark.parametrize('submissions', [1, 10, 200])
+def test_list_methods_load_venues_in_one_batch(app, fake_queries, name, call, submissions):
+    fake = fake_queries(submissions)
+    result = call()
+
+    assert len(result) == submissions
+    assert all(len(submission.venues) == 3 for submission in result)
+    # 一次查提交 + 一次批量查场地
+    assert len(fake.queries) == 2
+    assert 'submission_id IN' in fake.queries[1]
+
+
+def test_load_venues_skips_query_for_empty_list(app, fake_queries):
+    fake = fake_queries(0)
+    assert VenueSubmission.load_venues([]) == []
+    assert fake.queries == []
+
+
+def test_list_methods_without_results_run_single_query(app, fake_queries):
+    fake = fake_queries(0)
+    assert VenueSubmission.get_all_active() == []
+    assert len(fake.queries) == 1
+
+
+@pytest.mark.parametrize('submissions', [1, 100])
+def test_summary_by_date_is_one_query(app, fake_queries, submissions):
+    fake = fake_queries(submissions)
+    summary = VenueManager.get_summary_by_date('2024-01-01', compact=True)
+
+    assert sum(slot['count'] for slot in summary.values()) == submissions
+    assert len(fake.queries) == 1
+
+
+def test_user_stats_is_one_query(app, fake_queries):
+    fake = fake_queries(0)
+    stats = User.get_user_stats()
+
+    assert stats['total'] == 0
+    assert len(fake.queries) == 1
@@ -0,0 +1,83 @@
+"""热点查询的执行计划：按日期汇总、占用位图和待审核列表都走 002 号迁移建立的索引（需要 MySQL）"""
+from datetime import date, timedelta
+
+import pytest
+
+import models.venue
+from models.venue import VenueManager, VenueSubmission
+from utils.database import execute_query, get_db, transaction
+from utils.occupancy import occupancy_index
+
+BASE_DATE = date(2099, 1, 1)
+DAYS = 200
+SUBMISSIONS_PER_DAY = 10
+
+
+@pytest.fixture
+def seeded(mysql_app, make_group):
+    """约 2000 条提交（含少量待审核）分布在 200 天内，并更新索引统计信息"""
+    user_ids = [make_group() for _ in range(20)]
+    time_slots = [slot for slot, _ in mysql_app.config['TIME_SLOTS']]
+    with mysql_app.app_context():
+        with transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO venue_submissions (user_id, venue_date, registration_name, approval_status)
+                VALUES (%s, %s, %s, %s)
+            ''', [(user_ids[(day * SUBMISSIONS_PER_DAY + k) % len(user_ids)], BASE_DATE + timedelta(days=day),
+                   f'plan-{day}-{k}', 'pending' if k == 0 and day % 20 == 0 else 'approved')
+                  for day in range(DAYS) for k in range(SUBMISSIONS_PER_DAY)])
+            cursor.execute('''
+                INSERT INTO venues (submission_id, venue_number, time_slot)
+                SELECT id, id %% 24 + 1, ELT(id %% 3 + 1, %s, %s, %s)
+                FROM venue_submissions WHERE registration_name LIKE 'plan-%%' AND venue_date >= %s
+            ''', (*time_slots, BASE_DATE))
+        execute_query('ANALYZE TABLE users, venue_submissions, venues', fetch='all')
+    return mysql_app
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    """记录模型层经 execute_query 发出的 (SQL, 参数)，照常执行"""
+    statements = []
+
+    def spy(query, params=None, fetch=False):
+        statements.append((query, params))
+        return execute_query(query, params, fetch)
+
+    monkeypatch.setattr(models.venue, 'execute_query', spy)
+    return statements
+
+
+def explain(query, params):
+    cursor = get_db().cursor()
+    try:
+        cursor.execute('EXPLAIN ' + query, params or ())
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def assert_indexed(statements, tables=('vs', 'v', 'venue_submissions', 'venues')):
+    assert statements
+    for query, params in statements:
+        plan = explain(query, params)
+        for row in plan:
+            if row['table'] in tables:
+                assert row['type'] != 'ALL', f"full scan on {row['table']}: {plan}"
+                assert row['key'] is not None, f"no index on {row['table']}: {plan}"
+
+
+CALLS = [
+    ('summary', lambda: VenueManager.get_summary_by_date(BASE_DATE + timedelta(days=7))),
+    ('occupancy', lambda: VenueManager.get_occupancy_masks(BASE_DATE + timedelta(days=7), ['12:00-13:00', '13:00-14:00'])),
+    ('pending', lambda: VenueSubmission.get_pending_submissions()),
+]
+
+
+@pytest.mark.parametrize('name,call', CALLS, ids=[name for name, _ in CALLS])
+def test_hot_queries_use_indexes(seeded, captured, name, call):
+    with seeded.app_context():
+        occupancy_index.invalidate(BASE_DATE + timedelta(days=7))
+        call()
+        assert_indexed(captured)
@@ -0,0 +1,177 @@
+"""启动引导：已是最新 schema 且管理员齐全时不执行 DDL、不计算密码哈希；create_app() 启动耗时基准"""
+import statistics
+import time
+
+import pytest
+import werkzeug.security
+
+import utils.database
+from config import Config
+from utils.database import DEFAULT_ADMINS, MIGRATIONS, SCHEMA_VERSION, LockTimeout, run_migrations, seed_default_admins
+from tests.conftest import mysql_test_settings
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._result = []
+
+    def execute(self, query, args=None):
+        sql = ' '.join(query.split())
+        self.connection.statements.append(sql)
+        if sql.startswith('SELECT MAX(version) FROM schema_version'):
+            self._result = [(self.connection.schema_version,)]
+        elif sql.startswith('SELECT username FROM admins'):
+            self._result = [(name,) for name in self.connection.admins]
+        elif sql.startswith('SELECT GET_LOCK'):
+            self._result = [(1 if self.connection.lock_available else 0,)]
+        else:
+            self._result = []
+
+    def executemany(self, query, rows):
+        for row in rows:
+            self.execute(query, row)
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return list(self._result)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """记录所有语句的假连接，按 SQL 返回 schema 版本、已有管理员和 GET_LOCK 结果"""
+
+    def __init__(self, schema_version=SCHEMA_VERSION, admins=None, lock_available=True):
+        self.schema_version = schema_version
+        self.admins = [name for name, _ in DEFAULT_ADMINS] if admins is None else admins
+        self.lock_available = lock_available
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def password_hashes(monkeypatch):
+    """统计 generate_password_hash 的调用（不真正计算哈希）"""
+    calls = []
+
+    def fake_hash(password, *args, **kwargs):
+        calls.append(password)
+        return f'hash:{password}'
+
+    monkeypatch.setattr(werkzeug.security, 'generate_password_hash', fake_hash)
+    return calls
+
+
+def test_warm_start_runs_two_selects_and_no_hashing(password_hashes):
+    db = FakeConnection()
+
+    assert run_migrations(db) == SCHEMA_VERSION
+    assert seed_default_admins(db) == 0
+
+    assert len(db.statements) == 2
+    assert all(sql.startswith('SELECT') for sql in db.statements)
+    assert not any('GET_LOCK' in sql for sql in db.statements)
+    assert password_hashes == []
+    assert db.commits == 0
+
+
+def test_missing_admins_are_hashed_once_per_password(password_hashes):
+    db = FakeConnection(admins=['admin', 'ww'])
+
+    assert seed_default_admins(db) == len(DEFAULT_ADMINS) - 2
+
+    # 缺失的四个账号共用一个初始密码
+    assert password_hashes == ['mmyq123']
+    inserts = [sql for sql in db.statements if sql.startswith('INSERT IGNORE INTO admins')]
+    assert len(inserts) == len(DEFAULT_ADMINS) - 2
+    assert db.commits == 1
+
+
+def test_outdated_schema_applies_only_newer_migrations():
+    db = FakeConnection(schema_version=SCHEMA_VERSION - 1)
+
+    assert run_migrations(db) == SCHEMA_VERSION
+
+    recorded = [sql for sql in db.statements if sql.startswith('INSERT IGNORE INTO schema_version')]
+    assert len(recorded) == 1
+    assert db.statements[-1].startswith('SELECT RELEASE_LOCK')
+    assert not any('CREATE TABLE IF NOT EXISTS users' in sql for sql in db.statements)
+
+
+def test_migrations_abort_when_lock_not_acquired():
+    db = FakeConnection(schema_version=0, lock_available=False)
+
+    with pytest.raises(LockTimeout):
+        run_migrations(db)
+    assert not any(sql.startswith('CREATE TABLE') for sql in db.statements)
+
+
+def _legacy_bootstrap(app):
+    """改造前每次启动的工作量：执行全部建表/索引 DDL，并为六个管理员各计算一次密码哈希"""
+    with app.app_context():
+        db = utils.database.get_db()
+        cursor = db.cursor()
+        try:
+            for _, _, migrate in MIGRATIONS:
+                migrate(cursor)
+            db.commit()
+        finally:
+            cursor.close()
+        for _, password in DEFAULT_ADMINS:
+            werkzeug.security.generate_password_hash(password)
+
+
+def test_create_app_startup_benchmark(mysql_app, monkeypatch, capsys):
+    """真实 MySQL 上的 create_app() 启动耗时（-s 或直接查看输出的 benchmark 行）"""
+    from app import create_app
+
+    for key, value in mysql_test_settings().items():
+        monkeypatch.setattr(Config, key, value)
+
+    hashes = []
+    real_hash = werkzeug.security.generate_password_hash
+    monkeypatch.setattr(werkzeug.security, 'generate_password_hash',
+                        lambda password, *args, **kwargs: hashes.append(password) or real_hash(password))
+    bootstrap_queries = []
+    real_record = utils.database.record_query
+    monkeypatch.setattr(utils.database, 'record_query',
+                        lambda query, elapsed, args=None: bootstrap_queries.append(query) or real_record(query, elapsed, args))
+
+    runs = 5
+    warm = []
+    for _ in range(runs):
+        bootstrap_queries.clear()
+        started = time.perf_counter()
+        app = create_app('default')
+        warm.append(time.perf_counter() - started)
+        app.extensions['mysql_pool'].close_all()
+    warm_queries = len(bootstrap_queries)
+    warm_hashes = len(hashes)
+
+    legacy = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        _legacy_bootstrap(mysql_app)
+        legacy.append(time.perf_counter() - started)
+
+    with capsys.disabled():
+        print(f'\nbenchmark create_app(): warm median {statistics.median(warm) * 1000:.1f}ms '
+              f'({warm_queries} queries) vs legacy bootstrap median {statistics.median(legacy) * 1000:.1f}ms '
+              f'over {runs} runs')
+
+    assert warm_hashes == 0
+    assert warm_queries == 2
+    assert statistics.median(warm) < statistics.median(legacy)
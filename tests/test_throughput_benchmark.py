@@ -0,0 +1,124 @@
+"""gunicorn 多 worker 吞吐基准：按 gunicorn.conf.py 分别以 1、2、N 个 worker 启动，
+并发请求同一接口，每秒请求数应随 worker 数增加（需要 MySQL、gunicorn 和至少两个 CPU）
+"""
+import http.client
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from config import Config
+from tests.conftest import mysql_test_settings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLIENTS = 16
+DURATION = 5
+THREADS_PER_WORKER = 4
+PATH = '/venue-availability?start=2099-12-01&days=31'
+
+
+def create_benchmark_app():
+    """gunicorn 的应用工厂（tests.test_throughput_benchmark:create_benchmark_app()），连接测试库"""
+    from app import create_app
+
+    for key, value in mysql_test_settings().items():
+        setattr(Config, key, value)
+    return create_app('default')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with {process.returncode}')
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        try:
+            connection.request('GET', PATH)
+            if connection.getresponse().status == 200:
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            connection.close()
+        time.sleep(0.2)
+    raise RuntimeError('gunicorn did not become ready')
+
+
+def run_clients(port, duration):
+    """CLIENTS 个线程各用一个长连接持续请求 duration 秒，返回每秒成功请求数"""
+    counts = [0] * CLIENTS
+    errors = []
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        try:
+            while time.monotonic() < deadline:
+                connection.request('GET', PATH)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors.append(response.status)
+                    return
+                counts[index] += 1
+        except Exception as e:  # 线程内异常汇总到主线程断言
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(CLIENTS)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(duration + 30)
+    elapsed = time.monotonic() - started
+    assert not errors
+    return sum(counts) / elapsed
+
+
+def measure(workers):
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(THREADS_PER_WORKER),
+               PORT=str(port), JOB_WORKERS='0')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         'tests.test_throughput_benchmark:create_benchmark_app()'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_ready(port, process)
+        run_clients(port, 1)  # 预热：每个 worker 建好连接池和占用索引
+        return run_clients(port, DURATION)
+    finally:
+        process.terminate()
+        process.wait(30)
+
+
+def test_requests_per_second_rise_with_workers(mysql_app, capsys):
+    if importlib.util.find_spec('gunicorn') is None:
+        pytest.skip('gunicorn not installed')
+    cpus = os.cpu_count() or 1
+    if cpus < 2:
+        pytest.skip('needs at least two CPUs')
+
+    worker_counts = sorted({1, 2, min(cpus, 4)})
+    rates = {workers: measure(workers) for workers in worker_counts}
+
+    with capsys.disabled():
+        print('\nbenchmark gunicorn throughput: ' + ', '.join(
+            f'{workers} workers {rate:.0f} req/s' for workers, rate in rates.items()))
+
+    for fewer, more in zip(worker_counts, worker_counts[1:]):
+        assert rates[more] > rates[fewer]
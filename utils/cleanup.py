@@ -1,8 +1,13 @@
 import os
 import subprocess
+import pymysql
 from datetime import datetime, timedelta
 from flask import current_app
-from utils.database import execute_query
+from utils.database import execute_query, transaction
+from utils.storage import release_references, resolve_upload
+from utils.images import IMAGE_VARIANTS, variant_name
+from utils.occupancy import occupancy_index
+from utils.metrics import cleanup_duration, timed
 
 class DataCleanup:
     """数据和文件清理工具"""
@@ -13,35 +18,33 @@ class DataCleanup:
         from datetime import date
         cutoff_date = date.today() - timedelta(days=days_old)
         
+        # 每个场地一行（不用 GROUP_CONCAT：其结果受 group_concat_max_len 限制，默认 1024 字节会截断截图列表）
         query = '''
-            SELECT vs.id, vs.venue_date, vs.registration_name, 
-                   GROUP_CONCAT(v.venue_screenshot) as screenshots
+            SELECT vs.id, vs.venue_date, vs.registration_name, v.venue_screenshot
             FROM venue_submissions vs
             LEFT JOIN venues v ON vs.id = v.submission_id
             WHERE vs.venue_date <= %s
-            GROUP BY vs.id
-            ORDER BY vs.venue_date DESC
+            ORDER BY vs.venue_date DESC, vs.id, v.id
         '''
         
         try:
             results = execute_query(query, (cutoff_date,), fetch=True)
             
-            expired_data = []
-            if results:
-                for row in results:
-                    screenshots = []
-                    if row[3]:  # screenshots field
-                        screenshots = [s.strip() for s in row[3].split(',') if s.strip() and s.strip() != 'None']
-                    
+            submissions = {}
+            for row in results or []:
+                submission = submissions.get(row[0])
+                if submission is None:
                     # 转换日期为字符串格式
-                    venue_date_str = str(row[1]) if row[1] else 'Unknown'
-                    
-                    expired_data.append({
+                    submission = submissions[row[0]] = {
                         'submission_id': row[0],
-                        'venue_date': venue_date_str, 
+                        'venue_date': str(row[1]) if row[1] else 'Unknown',
                         'registration_name': row[2] or 'Unknown',
-                        'screenshots': screenshots
-                    })
+                        'screenshots': []
+                    }
+                # 同一截图被多个场地引用时保留多次，清理时按次数释放引用
+                if row[3] and row[3].strip() not in ('', 'None'):
+                    submission['screenshots'].append(row[3].strip())
+            expired_data = list(submissions.values())
             
             return expired_data
             
@@ -49,39 +52,81 @@ class DataCleanup:
             print(f"Error in get_expired_submissions: {e}")
             return []
     
+    @staticmethod
+    def _remove_file(file_path):
+        """删除单个文件 - 使用rm -rf命令，返回错误信息或 None"""
+        # 使用rm -rf删除文件（Linux环境）
+        if os.name == 'posix':  # Linux/Unix系统
+            result = subprocess.run(['rm', '-rf', file_path], 
+                                   capture_output=True, text=True)
+            return None if result.returncode == 0 else result.stderr
+        # Windows环境回退到Python删除
+        os.remove(file_path)
+        return None
+    
+    @staticmethod
+    def _remove_variants(filename, upload_folder, errors):
+        """删除截图的展示图/缩略图（不存在时忽略）"""
+        for size in IMAGE_VARIANTS:
+            variant_path = resolve_upload(variant_name(filename, size), upload_folder)
+            if variant_path:
+                try:
+                    error = DataCleanup._remove_file(variant_path)
+                    if error:
+                        errors.append(f"删除 {os.path.basename(variant_path)} 失败: {error}")
+                except Exception as e:
+                    errors.append(f"删除 {os.path.basename(variant_path)} 时出错: {str(e)}")
+    
     @staticmethod
     def delete_image_files(screenshot_filenames):
-        """删除图片文件 - 使用rm -rf命令"""
+        """释放图片引用并删除不再被引用的文件
+        
+        按内容寻址的文件（sha256.扩展名）在最后一个引用释放时才删除；
+        没有引用计数的旧文件直接删除。同名出现几次释放几次引用。
+        """
         if not screenshot_filenames:
             return {'success': True, 'deleted': 0, 'errors': []}
         
         upload_folder = current_app.config['UPLOAD_FOLDER']
+        filenames = [filename.strip() for filename in screenshot_filenames if filename and filename.strip()]
         deleted_count = 0
         errors = []
         
-        for filename in screenshot_filenames:
-            if filename and filename.strip():
-                file_path = os.path.join(upload_folder, filename.strip())
-                try:
-                    # 检查文件是否存在
-                    if os.path.exists(file_path):
-                        # 使用rm -rf删除文件（Linux环境）
-                        if os.name == 'posix':  # Linux/Unix系统
-                            result = subprocess.run(['rm', '-rf', file_path], 
-                                                   capture_output=True, text=True)
-                            if result.returncode == 0:
-                                deleted_count += 1
+        try:
+            with transaction() as cursor:
+                unreferenced, untracked = release_references(cursor, filenames)
+                # 在提交前删除，行锁阻止并发上传同内容时误以为文件仍存在
+                for filename in unreferenced:
+                    DataCleanup._remove_variants(filename, upload_folder, errors)
+                    file_path = resolve_upload(filename, upload_folder)
+                    try:
+                        if file_path:
+                            error = DataCleanup._remove_file(file_path)
+                            if error:
+                                errors.append(f"删除 {filename} 失败: {error}")
                             else:
-                                errors.append(f"删除 {filename} 失败: {result.stderr}")
-                        else:
-                            # Windows环境回退到Python删除
-                            os.remove(file_path)
-                            deleted_count += 1
+                                deleted_count += 1
+                    except Exception as e:
+                        errors.append(f"删除 {filename} 时出错: {str(e)}")
+        except pymysql.Error as e:
+            return {'success': False, 'deleted': 0, 'errors': [f'释放图片引用失败: {str(e)}']}
+        
+        for filename in untracked:
+            DataCleanup._remove_variants(filename, upload_folder, errors)
+            file_path = resolve_upload(filename, upload_folder)
+            try:
+                # 检查文件是否存在（分片目录或未迁移的根目录）
+                if file_path:
+                    error = DataCleanup._remove_file(file_path)
+                    if error:
+                        errors.append(f"删除 {filename} 失败: {error}")
                     else:
-                        errors.append(f"文件不存在: {filename}")
-                        
-                except Exception as e:
-                    errors.append(f"删除 {filename} 时出错: {str(e)}")
+                        deleted_count += 1
+                else:
+                    errors.append(f"文件不存在: {filename}")
+                    
+            except Exception as e:
+                errors.append(f"删除 {filename} 时出错: {str(e)}")
         
         return {
             'success': len(errors) == 0,
@@ -106,6 +151,7 @@ class DataCleanup:
             '''
             
             result = execute_query(delete_query)
+            occupancy_index.invalidate_all()
             
             if result is not None:
                 return {'success': True, 'deleted': result}
@@ -117,6 +163,13 @@ class DataCleanup:
     
     @staticmethod
     def cleanup_expired_data(days_old=3, dry_run=False):
+        """清理过期数据（记录耗时指标），参数与返回值见 _cleanup_expired_data"""
+        job = 'cleanup_expired_data_dry_run' if dry_run else 'cleanup_expired_data'
+        with timed(cleanup_duration, (job,)):
+            return DataCleanup._cleanup_expired_data(days_old, dry_run)
+    
+    @staticmethod
+    def _cleanup_expired_data(days_old=3, dry_run=False):
         """
         清理过期数据
         
@@ -187,6 +240,11 @@ class DataCleanup:
     @staticmethod
     def get_cleanup_stats():
         """获取清理统计信息"""
+        with timed(cleanup_duration, ('get_cleanup_stats',)):
+            return DataCleanup._get_cleanup_stats()
+    
+    @staticmethod
+    def _get_cleanup_stats():
         from datetime import date
         
         today = date.today()
@@ -1,23 +1,359 @@
 import pymysql
-from flask import current_app, g
+import pymysql.cursors
+from flask import current_app, g, has_app_context
+import os
+import re
 import sys
+import threading
+import time
+from collections import deque
+from utils.metrics import db_query_duration
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """等待连接池空闲连接超时"""
+    pass
+
+
+class LockTimeout(Exception):
+    """获取数据库命名锁超时"""
+    pass
+
+
+_SQL_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_SQL_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SQL_SPACE = re.compile(r'\s+')
+_SQL_TUPLE = r'\(\?(?: ?, ?\?)*\)'
+_SQL_IN_LIST = re.compile(r'\bIN ?\(\?(?: ?, ?\?)+\)', re.I)
+_SQL_IN_TUPLES = re.compile(r'\bIN ?\(' + _SQL_TUPLE + r'(?: ?, ?' + _SQL_TUPLE + r')+\)', re.I)
+_SQL_VALUES = re.compile(r'\bVALUES ?(' + _SQL_TUPLE + r')(?: ?, ?' + _SQL_TUPLE + r')+', re.I)
+
+
+def normalize_sql(query):
+    """归一化 SQL：去掉字面量和多余空白，合并 IN/VALUES 列表，用于聚合统计和慢查询日志"""
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    query = _SQL_STRING.sub('?', query)
+    query = _SQL_NUMBER.sub('?', query)
+    query = query.replace('%s', '?')
+    query = _SQL_SPACE.sub(' ', query).strip()
+    query = _SQL_IN_TUPLES.sub('IN ((...)+)', query)
+    query = _SQL_IN_LIST.sub('IN (?+)', query)
+    return _SQL_VALUES.sub(r'VALUES \1+', query)
+
+
+class QueryStats:
+    """按归一化 SQL 聚合的查询统计（次数、总耗时、最大耗时）"""
+
+    def __init__(self, max_statements=500):
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._statements = {}  # normalized sql -> [count, total_seconds, max_seconds]
+        self._cache = {}  # raw sql -> normalized sql
+
+    def record(self, query, elapsed):
+        normalized = self._cache.get(query)
+        if normalized is None:
+            normalized = normalize_sql(query)
+            if len(self._cache) < self.max_statements * 4:
+                self._cache[query] = normalized
+        with self._lock:
+            entry = self._statements.get(normalized)
+            if entry is None:
+                if len(self._statements) >= self.max_statements:
+                    return normalized
+                entry = self._statements[normalized] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += elapsed
+            if elapsed > entry[2]:
+                entry[2] = elapsed
+        return normalized
+
+    def top(self, limit=20, order_by='total'):
+        """耗时最多（或次数最多、单次最慢）的前 N 条查询"""
+        index = {'count': 0, 'total': 1, 'max': 2}.get(order_by, 1)
+        with self._lock:
+            items = sorted(self._statements.items(), key=lambda item: item[1][index], reverse=True)[:limit]
+        return [{
+            'sql': sql,
+            'count': count,
+            'total_ms': round(total * 1000, 3),
+            'avg_ms': round(total * 1000 / count, 3) if count else 0.0,
+            'max_ms': round(maximum * 1000, 3)
+        } for sql, (count, total, maximum) in items]
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+
+
+query_stats = QueryStats()
+
+
+def record_query(query, elapsed, args=None):
+    """记录一次查询：请求级计数/耗时、全局聚合统计、慢查询日志（参数不输出）"""
+    normalized = query_stats.record(query, elapsed)
+    db_query_duration.observe(elapsed)
+    if not has_app_context():
+        return
+    g.db_query_count = g.get('db_query_count', 0) + 1
+    g.db_time = g.get('db_time', 0.0) + elapsed
+    
+    threshold = current_app.config.get('SLOW_QUERY_MS')
+    if threshold is not None and elapsed * 1000 >= threshold:
+        param_count = len(args) if isinstance(args, (list, tuple, dict)) else (0 if args is None else 1)
+        print(f"Slow query ({elapsed * 1000:.1f}ms, {param_count} params redacted): {normalized}",
+              file=sys.stderr)
+
+
+class InstrumentedCursor(pymysql.cursors.Cursor):
+    """为每条语句计时的游标（executemany 内部也经由 execute）"""
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            record_query(query, time.perf_counter() - started, args)
+
+
+class ConnectionPool:
+    """线程安全的 MySQL 连接池
+
+    - size: 常驻空闲连接上限
+    - max_overflow: 高峰期允许额外创建的连接数，归还时直接关闭
+    - timeout: 连接全部占用时借出等待的最长秒数
+    - recycle: 连接最长存活秒数，超过后归还/借出时重建
+    - pre_ping: 连接空闲超过该秒数时，借出前先 ping 检查（0 表示每次都检查）
+    """
+
+    def __init__(self, connect_kwargs, size=5, max_overflow=10, timeout=10,
+                 recycle=3600, pre_ping=30):
+        self.connect_kwargs = dict(connect_kwargs)
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, created_at, last_used)
+        self._created_at = {}  # id(conn) -> created_at
+        self._open = 0
+        self._in_use = 0
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._timeouts = 0
+        self._recycled = 0
+        self._ping_failures = 0
+
+    def _connect(self):
+        return pymysql.connect(**self.connect_kwargs)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """借出一个可用连接，必要时等待、ping 或重建"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        entry = None
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f'No connection available within {self.timeout}s '
+                        f'(open={self._open}, in_use={self._in_use})'
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            self._in_use += 1
+            self._checkouts += 1
+            wait_time = time.monotonic() - start
+            if waited:
+                self._waits += 1
+            self._wait_time += wait_time
+            self._max_wait_time = max(self._max_wait_time, wait_time)
+
+        conn = None
+        if entry is not None:
+            conn, created_at, last_used = entry
+            now = time.monotonic()
+            if self.recycle and now - created_at > self.recycle:
+                self._discard(conn, recycled=True)
+                conn = None
+            elif now - last_used >= self.pre_ping:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    self._discard(conn, ping_failed=True)
+                    conn = None
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+            self._created_at[id(conn)] = time.monotonic()
+
+        return conn
+
+    def _discard(self, conn, recycled=False, ping_failed=False):
+        """关闭一个已借出的连接，但保留其占用名额（调用方将重建）"""
+        self._created_at.pop(id(conn), None)
+        self._close_quietly(conn)
+        with self._cond:
+            if recycled:
+                self._recycled += 1
+            if ping_failed:
+                self._ping_failures += 1
+
+    def release(self, conn):
+        """归还连接：回滚未结束的事务，超量或过期的连接直接关闭"""
+        healthy = True
+        try:
+            conn.rollback()
+        except Exception:
+            healthy = False
+
+        created_at = self._created_at.get(id(conn), 0)
+        now = time.monotonic()
+        expired = bool(self.recycle) and now - created_at > self.recycle
+
+        with self._cond:
+            self._in_use -= 1
+            keep = healthy and not expired and len(self._idle) < self.size
+            if keep:
+                self._idle.append((conn, created_at, now))
+            else:
+                self._open -= 1
+                if expired:
+                    self._recycled += 1
+            self._cond.notify()
+
+        if not keep:
+            self._created_at.pop(id(conn), None)
+            self._close_quietly(conn)
+
+    def close_all(self):
+        """关闭所有空闲连接（已借出的连接在归还时按正常流程处理）"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for conn, _, _ in idle:
+            self._created_at.pop(id(conn), None)
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'overflow': max(0, self._open - self.size),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'total_wait_time': round(self._wait_time, 6),
+                'avg_wait_time': round(self._wait_time / self._checkouts, 6) if self._checkouts else 0.0,
+                'max_wait_time': round(self._max_wait_time, 6),
+                'recycled': self._recycled,
+                'ping_failures': self._ping_failures,
+            }
+
+
+_pool_lock = threading.Lock()
+
+
+def _create_pool(config):
+    return ConnectionPool(
+        dict(
+            host=config['MYSQL_HOST'],
+            user=config['MYSQL_USER'],
+            password=config['MYSQL_PASSWORD'],
+            database=config['MYSQL_DB'],
+            port=config['MYSQL_PORT'],
+            charset='utf8mb4',
+            autocommit=False,
+            cursorclass=InstrumentedCursor,
+            connect_timeout=5,
+            read_timeout=10,
+            write_timeout=10
+        ),
+        size=config.get('MYSQL_POOL_SIZE', 5),
+        max_overflow=config.get('MYSQL_POOL_MAX_OVERFLOW', 10),
+        timeout=config.get('MYSQL_POOL_TIMEOUT', 10),
+        recycle=config.get('MYSQL_POOL_RECYCLE', 3600),
+        pre_ping=config.get('MYSQL_POOL_PRE_PING', 30)
+    )
+
+
+def get_pool(app=None):
+    """获取（必要时创建）当前应用的连接池
+
+    连接池属于创建它的进程：fork 出的子进程（如 gunicorn preload 后的 worker）
+    第一次使用时会丢弃继承来的连接池并新建，不与父进程共用 socket。
+    """
+    app = app or current_app._get_current_object()
+    pool = app.extensions.get('mysql_pool')
+    if pool is None or pool.pid != os.getpid():
+        with _pool_lock:
+            pool = app.extensions.get('mysql_pool')
+            if pool is None or pool.pid != os.getpid():
+                pool = app.extensions['mysql_pool'] = _create_pool(app.config)
+    return pool
+
+
+def reset_pool(app):
+    """fork 后在子进程中调用：丢弃继承的连接池
+
+    继承来的连接不能 close()（会向服务器发送 QUIT，断开父进程仍在使用的会话），
+    只解除引用，由子进程按需重新建立连接。
+    """
+    with _pool_lock:
+        pool = app.extensions.get('mysql_pool')
+        if pool is not None and pool.pid != os.getpid():
+            del app.extensions['mysql_pool']
+
+
+def get_pool_stats():
+    """连接池监控数据（占用、空闲、等待时间等）"""
+    pool = current_app.extensions.get('mysql_pool')
+    return pool.stats() if pool is not None else {}
+
 
 def get_db():
     if 'db' not in g:
         try:
-            g.db = pymysql.connect(
-                host=current_app.config['MYSQL_HOST'],
-                user=current_app.config['MYSQL_USER'],
-                password=current_app.config['MYSQL_PASSWORD'],
-                database=current_app.config['MYSQL_DB'],
-                port=current_app.config['MYSQL_PORT'],
-                charset='utf8mb4',
-                autocommit=False,
-                connect_timeout=5,
-                read_timeout=10,
-                write_timeout=10
-            )
-        except pymysql.Error as e:
+            g.db = get_pool().acquire()
+        except (pymysql.Error, PoolTimeout) as e:
             print(f"Database connection error: {e}", file=sys.stderr)
             return None
     return g.db
@@ -25,15 +361,30 @@ def get_db():
 def close_db(e=None):
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        get_pool().release(db)
 
-def init_db():
-    db = get_db()
-    if db is None:
-        return False
-    
-    cursor = db.cursor()
-    
+def _column_exists(cursor, table, column):
+    cursor.execute('''
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    ''', (table, column))
+    return cursor.fetchone() is not None
+
+def _index_exists(cursor, table, index_name):
+    cursor.execute('''
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    ''', (table, index_name))
+    return cursor.fetchone() is not None
+
+def _create_index(cursor, table, index_name, columns, unique=False):
+    if not _index_exists(cursor, table, index_name):
+        kind = 'UNIQUE INDEX' if unique else 'INDEX'
+        cursor.execute(f'CREATE {kind} {index_name} ON {table} ({columns})')
+
+def _migration_001_base_tables(cursor):
+    """基础表结构"""
     # Create users table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -62,14 +413,11 @@ def init_db():
     ''')
     
     # Add approval_status column if it doesn't exist (for existing databases)
-    try:
+    if not _column_exists(cursor, 'venue_submissions', 'approval_status'):
         cursor.execute('''
             ALTER TABLE venue_submissions 
             ADD COLUMN approval_status ENUM('approved', 'pending') DEFAULT 'approved'
         ''')
-    except pymysql.Error:
-        # Column already exists or other error, ignore
-        pass
     
     # Create venues table (individual venues within a submission)
     cursor.execute('''
@@ -93,29 +441,180 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
     ''')
-    
-    # Insert default admin users
-    # Password hash for 'mmyq123' using werkzeug
+
+def _migration_002_query_indexes(cursor):
+    """常用查询的组合索引"""
+    # 按日期汇总/占用查询：venue_date 等值 + 状态过滤
+    _create_index(cursor, 'venue_submissions', 'idx_vs_date_status',
+                  'venue_date, status, approval_status, user_id')
+    # 待审核列表按 upload_time 排序；首页/管理面板按日期+上传时间倒序分页
+    _create_index(cursor, 'venue_submissions', 'idx_vs_status_approval_upload',
+                  'status, approval_status, upload_time')
+    _create_index(cursor, 'venue_submissions', 'idx_vs_status_date_upload',
+                  'status, venue_date, upload_time')
+    # 用户自己的提交列表
+    _create_index(cursor, 'venue_submissions', 'idx_vs_user_status_date',
+                  'user_id, status, venue_date')
+    # 批量加载提交下的场地（覆盖排序列）
+    _create_index(cursor, 'venues', 'idx_venues_submission_slot',
+                  'submission_id, time_slot, venue_number')
+    # 按时间段/场地号检查冲突
+    _create_index(cursor, 'venues', 'idx_venues_slot_number',
+                  'time_slot, venue_number')
+    _create_index(cursor, 'users', 'idx_users_status', 'status')
+
+def _migration_003_upload_blobs(cursor):
+    """按内容寻址的截图文件引用计数（文件名为 sha256.扩展名）"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upload_blobs (
+            filename VARCHAR(100) PRIMARY KEY,
+            sha256 CHAR(64) NOT NULL,
+            size_bytes BIGINT NOT NULL,
+            ref_count INT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    ''')
+
+def _migration_004_background_jobs(cursor):
+    """后台任务队列（上传后处理等），各进程的 worker 用 SKIP LOCKED 领取任务"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS background_jobs (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            kind VARCHAR(50) NOT NULL,
+            payload TEXT NOT NULL,
+            status ENUM('queued', 'running', 'done', 'dead') NOT NULL DEFAULT 'queued',
+            attempts INT NOT NULL DEFAULT 0,
+            max_attempts INT NOT NULL DEFAULT 5,
+            run_after DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            locked_by VARCHAR(100) NULL,
+            locked_at DATETIME NULL,
+            last_error TEXT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_jobs_status_run_after (status, run_after)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    ''')
+
+def _migration_005_occupancy_versions(cursor):
+    """按日期的占用数据版本（另有 scope='*' 的全局一行），各进程据此生成一致的 ETag"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS occupancy_versions (
+            scope VARCHAR(20) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    ''')
+
+# 按版本号顺序执行的迁移步骤；已发布的步骤不要修改，新增变更请追加新版本
+MIGRATIONS = [
+    (1, 'base tables', _migration_001_base_tables),
+    (2, 'composite indexes for hot queries', _migration_002_query_indexes),
+    (3, 'content-addressed upload reference counts', _migration_003_upload_blobs),
+    (4, 'background job queue', _migration_004_background_jobs),
+    (5, 'shared occupancy versions', _migration_005_occupancy_versions),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(cursor):
+    """当前已应用的最高迁移版本；schema_version 表不存在时返回 0"""
+    try:
+        cursor.execute('SELECT MAX(version) FROM schema_version')
+    except pymysql.err.ProgrammingError:
+        return 0
+    row = cursor.fetchone()
+    return row[0] if row and row[0] is not None else 0
+
+def run_migrations(db):
+    """按顺序执行尚未应用的迁移（多个进程同时启动时用 GET_LOCK 串行化）
+
+    已是最新版本时只执行一次 SELECT，不加锁也不执行任何 DDL。
+    """
+    cursor = db.cursor()
+    try:
+        current = get_schema_version(cursor)
+        if current >= SCHEMA_VERSION:
+            db.rollback()
+            return current
+        
+        cursor.execute("SELECT GET_LOCK('mmyq_schema_migration', 60)")
+        row = cursor.fetchone()
+        if not row or row[0] != 1:
+            raise LockTimeout('Could not acquire schema migration lock within 60s')
+        try:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INT PRIMARY KEY,
+                    description VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            ''')
+            # 等锁期间其他进程可能已完成迁移，重新读取
+            current = get_schema_version(cursor)
+            for version, description, migrate in MIGRATIONS:
+                if version <= current:
+                    continue
+                print(f"Applying schema migration {version}: {description}", file=sys.stderr)
+                migrate(cursor)
+                cursor.execute(
+                    'INSERT IGNORE INTO schema_version (version, description) VALUES (%s, %s)',
+                    (version, description)
+                )
+                db.commit()
+                current = version
+            return current
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK('mmyq_schema_migration')")
+    finally:
+        cursor.close()
+
+# 默认管理员账号：(用户名, 初始密码)
+DEFAULT_ADMINS = [
+    ('admin', 'admin123'),  # 保留原有的admin账号
+    ('ww', 'mmyq123'),
+    ('daxia', 'mmyq123'),
+    ('xiaoxiong', 'mmyq123'),
+    ('molly', 'mmyq123'),
+    ('limou', 'mmyq123')
+]
+
+def seed_default_admins(db):
+    """只为缺失的默认管理员计算密码哈希并插入（哈希计算刻意很慢）"""
     from werkzeug.security import generate_password_hash
-    admin_password = generate_password_hash('mmyq123')
-    
-    admin_users = [
-        ('admin', generate_password_hash('admin123')),  # 保留原有的admin账号
-        ('ww', admin_password),
-        ('daxia', admin_password), 
-        ('xiaoxiong', admin_password),
-        ('molly', admin_password),
-        ('limou', admin_password)
-    ]
     
-    for username, password_hash in admin_users:
-        cursor.execute('''
+    usernames = [username for username, _ in DEFAULT_ADMINS]
+    placeholders = ','.join(['%s'] * len(usernames))
+    cursor = db.cursor()
+    try:
+        cursor.execute(f'SELECT username FROM admins WHERE username IN ({placeholders})', usernames)
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [(username, password) for username, password in DEFAULT_ADMINS if username not in existing]
+        if not missing:
+            db.rollback()
+            return 0
+        
+        # 相同密码只计算一次哈希
+        hashes = {}
+        for _, password in missing:
+            if password not in hashes:
+                hashes[password] = generate_password_hash(password)
+        
+        cursor.executemany('''
             INSERT IGNORE INTO admins (username, password_hash)
             VALUES (%s, %s)
-        ''', (username, password_hash))
+        ''', [(username, hashes[password]) for username, password in missing])
+        db.commit()
+        return len(missing)
+    finally:
+        cursor.close()
+
+def init_db():
+    db = get_db()
+    if db is None:
+        return False
     
-    db.commit()
-    cursor.close()
+    run_migrations(db)
+    seed_default_admins(db)
     return True
 
 def execute_query(query, params=None, fetch=False):
@@ -140,4 +639,55 @@ def execute_query(query, params=None, fetch=False):
         db.rollback()
         return None
     finally:
-        cursor.close()
\ No newline at end of file
+        cursor.close()
+
+@contextmanager
+def transaction():
+    """在当前请求连接上开启一个事务，成功提交、异常回滚
+
+    execute_query 会逐条提交，需要多条语句原子执行时改用此方法拿到 cursor。
+    事务总是从新的快照开始；在其中执行前不要有未提交的写入。
+    """
+    db = get_db()
+    if db is None:
+        raise pymysql.err.OperationalError('Database connection unavailable')
+    
+    # 结束连接上之前读取留下的事务（execute_query 的读取不提交）：REPEATABLE READ 下
+    # 否则事务内读到的是加锁之前的快照，看不到其他请求在此期间提交的预订
+    db.rollback()
+    cursor = db.cursor()
+    try:
+        yield cursor
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+@contextmanager
+def named_lock(name, timeout=10):
+    """MySQL 命名锁（GET_LOCK），用于串行化跨进程的临界区
+
+    锁属于连接会话，应包在 transaction() 外层，保证提交后才释放。
+    """
+    db = get_db()
+    if db is None:
+        raise pymysql.err.OperationalError('Database connection unavailable')
+    
+    cursor = db.cursor()
+    try:
+        cursor.execute('SELECT GET_LOCK(%s, %s)', (name, timeout))
+        row = cursor.fetchone()
+        if not row or row[0] != 1:
+            raise LockTimeout(f'Could not acquire lock {name} within {timeout}s')
+        try:
+            yield
+        finally:
+            cursor.execute('SELECT RELEASE_LOCK(%s)', (name,))
+    finally:
+        cursor.close()
+
+def booking_lock(venue_date, timeout=10):
+    """同一日期的预订/迁移互斥锁"""
+    return named_lock(f'mmyq_booking_{venue_date}', timeout)
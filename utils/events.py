@@ -0,0 +1,164 @@
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from utils.occupancy import occupancy_index
+
+
+class Subscription:
+    """单个 SSE 客户端的订阅（有界队列）"""
+
+    def __init__(self, venue_date, max_queue):
+        self.venue_date = venue_date
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = False
+
+
+class BookingEventBroker:
+    """场地变更发布/订阅（跨 gunicorn worker）
+
+    - 按日期订阅，发布时只投递给该日期的订阅者
+    - 变更来源是 occupancy_versions 表中的共享版本：每个进程在有订阅者时启动一个 watcher 线程
+      （ensure_watching），每 poll_interval 秒一次查询读取已订阅日期的版本，版本变化即发布，
+      因此任何 worker 上的写入都会推送给所有 worker 的订阅者
+    - 每个订阅者队列有上限，队列满（客户端消费太慢）时直接断开该订阅者，
+      客户端收到 reset 事件后应重新加载完整数据
+    - max_subscribers 限制同时在线的订阅数：gthread worker 中每个推送连接占用一个线程，
+      上限应远小于每进程线程数，超出时返回 503
+    - 单个推送连接最长保持 max_duration 秒，到期发送 reset 后断开，客户端重连并重新加载，
+      不会让一个连接长期占住线程
+    """
+
+    def __init__(self, max_subscribers=2, max_queue=100, poll_interval=2):
+        self.max_subscribers = max_subscribers
+        self.max_queue = max_queue
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subscribers = {}  # date -> set(Subscription)
+        self._seen = {}  # date -> (全局版本, 日期版本)
+        self._count = 0
+        self._published = 0
+        self._dropped = 0
+        self._pid = None
+
+    def configure(self, max_subscribers=None, max_queue=None, poll_interval=None):
+        with self._lock:
+            if max_subscribers is not None:
+                self.max_subscribers = max_subscribers
+            if max_queue is not None:
+                self.max_queue = max_queue
+            if poll_interval is not None:
+                self.poll_interval = poll_interval
+
+    def ensure_watching(self, app):
+        """在当前进程启动版本 watcher 线程（已启动时直接返回）"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._watch, args=(app,), name='booking-events-watcher',
+                             daemon=True).start()
+
+    def _watch(self, app):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                with app.app_context():
+                    self.poll()
+            except Exception as e:
+                print(f"Booking events watcher error: {e}", file=sys.stderr)
+
+    def poll(self):
+        """读取已订阅日期的共享版本，版本变化的日期发布一次变更；首次读到的版本只作为基线"""
+        with self._lock:
+            dates = list(self._subscribers)
+            for venue_date in [venue_date for venue_date in self._seen if venue_date not in self._subscribers]:
+                del self._seen[venue_date]
+        if not dates:
+            return
+        versions = occupancy_index.shared_versions(dates)
+        if versions is None:
+            return
+        for venue_date in dates:
+            current = (versions[occupancy_index.GLOBAL_SCOPE], versions[venue_date])
+            with self._lock:
+                previous = self._seen.get(venue_date)
+                self._seen[venue_date] = current
+            if previous is not None and previous != current:
+                self.publish(venue_date, current[1])
+
+    def subscribe(self, venue_date):
+        """订阅某日期的变更，超过订阅上限时返回 None"""
+        venue_date = str(venue_date)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            subscription = Subscription(venue_date, self.max_queue)
+            self._subscribers.setdefault(venue_date, set()).add(subscription)
+            self._count += 1
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.venue_date)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.venue_date]
+
+    def publish(self, venue_date, version):
+        """通知该日期的订阅者占用已变化（version 为新的共享版本），客户端收到后重新加载"""
+        venue_date = str(venue_date)
+        payload = json.dumps({'date': venue_date, 'version': version})
+        with self._lock:
+            self._published += 1
+            subscribers = list(self._subscribers.get(venue_date, ()))
+
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(payload)
+            except queue.Full:
+                subscription.dropped = True
+                self.unsubscribe(subscription)
+                with self._lock:
+                    self._dropped += 1
+
+    def stream(self, subscription, heartbeat=15, max_duration=None):
+        """生成 SSE 文本流，空闲时发送注释行保持连接，超过 max_duration 秒后结束"""
+        deadline = time.monotonic() + max_duration if max_duration else None
+        try:
+            yield 'retry: 3000\n\n'
+            while not subscription.dropped:
+                timeout = heartbeat
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    timeout = min(heartbeat, remaining)
+                try:
+                    payload = subscription.queue.get(timeout=timeout)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'event: change\ndata: {payload}\n\n'
+            yield 'event: reset\ndata: {}\n\n'
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': self._count,
+                'dates': len(self._subscribers),
+                'max_subscribers': self.max_subscribers,
+                'published': self._published,
+                'dropped_slow_consumers': self._dropped,
+            }
+
+
+booking_events = BookingEventBroker()
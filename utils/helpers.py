@@ -1,7 +1,13 @@
 import os
-import secrets
+import sys
+import time
+import pymysql
 from werkzeug.utils import secure_filename
 from flask import current_app
+from utils.metrics import upload_bytes, upload_deduplicated, upload_duration
+from utils.storage import resolve_upload, store_upload, verify_blob
+from utils.images import create_variants
+from utils.jobs import job_queue
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -9,11 +15,10 @@ def allowed_file(filename):
 
 def save_uploaded_file(file):
     if file and file.filename and allowed_file(file.filename):
-        # Generate a secure random filename
+        # Content-addressed filename (sha256.ext): identical screenshots are stored once
         filename = secure_filename(file.filename)
         if '.' in filename:
             file_ext = filename.rsplit('.', 1)[1].lower()
-            random_name = secrets.token_hex(16) + '.' + file_ext
             
             # Ensure upload directory exists with proper permissions
             upload_folder = current_app.config['UPLOAD_FOLDER']
@@ -23,16 +28,39 @@ def save_uploaded_file(file):
             if os.name == 'posix':  # Linux/Unix
                 os.chmod(upload_folder, 0o755)
             
-            file_path = os.path.join(upload_folder, random_name)
-            file.save(file_path)
-            
-            # Set file permissions (readable by web server)
-            if os.name == 'posix':  # Linux/Unix
-                os.chmod(file_path, 0o644)
+            started = time.perf_counter()
+            try:
+                stored_name, size, written = store_upload(file, file_ext)
+            except (pymysql.Error, OSError) as e:
+                print(f"Error saving upload: {e}", file=sys.stderr)
+                return None
+            upload_duration.observe(time.perf_counter() - started)
+            if written:
+                upload_bytes.inc(size)
+                # 新内容的校验和展示图/缩略图交给后台任务（相同内容已处理过）；
+                # 未启用后台任务或入队失败时同步处理
+                if not current_app.config.get('JOB_WORKERS') or \
+                        job_queue.enqueue('process_upload', filename=stored_name) is None:
+                    create_variants(stored_name)
+            else:
+                upload_deduplicated.inc()
                 
-            return random_name
+            return stored_name
     return None
 
+@job_queue.handler('process_upload')
+def process_upload(filename):
+    """后台任务：校验已保存截图的内容哈希，并生成展示图/缩略图"""
+    if verify_blob(filename) is None:
+        return  # 文件已被删除（例如预订失败后清理）
+    created = create_variants(filename, raise_errors=True)
+    # 处理期间原图被清理时，删除刚生成的派生文件，避免遗留
+    if created and resolve_upload(filename) is None:
+        for name in created:
+            path = resolve_upload(name)
+            if path:
+                os.remove(path)
+
 def format_datetime(dt):
     return dt.strftime('%Y-%m-%d %H:%M') if dt else ''
 
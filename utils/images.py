@@ -0,0 +1,106 @@
+import os
+import sys
+from flask import current_app
+from utils.storage import is_blob_name, resolve_upload, sharded_path, temp_upload_path
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow 为可选依赖，未安装时只保存原图
+    Image = None
+    ImageOps = None
+
+# 截图的派生版本：full 为限制尺寸、去除元数据后的展示图，thumb 为列表/预览用缩略图
+IMAGE_VARIANTS = ('full', 'thumb')
+VARIANT_FORMAT = 'WEBP'
+VARIANT_EXTENSION = 'webp'
+PROCESSABLE_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+
+
+def image_processing_available():
+    return Image is not None
+
+
+def variant_name(filename, size):
+    """派生文件名：<原文件名去扩展名>.<size>.webp，与原图落在同一个分片目录"""
+    return f"{filename.rsplit('.', 1)[0]}.{size}.{VARIANT_EXTENSION}"
+
+
+def variants_pending(filename):
+    """该文件是否会（由后台任务）生成派生版本：旧的随机文件名、GIF 或未安装 Pillow 时不会"""
+    if Image is None or not is_blob_name(filename):
+        return False
+    return filename.rsplit('.', 1)[1].lower() in PROCESSABLE_EXTENSIONS
+
+
+def resolve_variant(filename, size=None, upload_folder=None):
+    """按请求的尺寸查找要返回的文件，派生版本不存在时逐级回退到原图
+
+    size 为 None 或 'full' 时返回展示图，'thumb' 返回缩略图；返回 (路径, 文件名) 或 (None, None)。
+    """
+    upload_folder = upload_folder or current_app.config['UPLOAD_FOLDER']
+    chain = ['thumb', 'full'] if size == 'thumb' else ['full']
+    for variant in chain:
+        name = variant_name(filename, variant)
+        path = resolve_upload(name, upload_folder)
+        if path:
+            return path, name
+    path = resolve_upload(filename, upload_folder)
+    return (path, filename) if path else (None, None)
+
+
+def _save_variant(image, upload_folder, name, box, quality):
+    variant = image.copy()
+    variant.thumbnail(box, Image.LANCZOS)
+    target = sharded_path(upload_folder, name)
+    temp_path = temp_upload_path(upload_folder)
+    try:
+        # 不传 exif/icc_profile，元数据不会写入派生文件
+        variant.save(temp_path, VARIANT_FORMAT, quality=quality, method=4)
+        if os.name == 'posix':
+            os.chmod(temp_path, 0o644)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(temp_path, target)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def create_variants(filename, upload_folder=None, config=None, raise_errors=False):
+    """为原图生成展示图和缩略图，返回生成的文件名列表
+
+    未安装 Pillow、格式不支持（如 GIF）或图片无法解析时返回空列表，原图照常可用；
+    raise_errors=True 时处理异常向上抛出（后台任务据此重试）。
+    """
+    if Image is None or '.' not in filename:
+        return []
+    if filename.rsplit('.', 1)[1].lower() not in PROCESSABLE_EXTENSIONS:
+        return []
+
+    config = config or current_app.config
+    upload_folder = upload_folder or config['UPLOAD_FOLDER']
+    source = resolve_upload(filename, upload_folder)
+    if not source:
+        return []
+
+    sizes = {
+        'full': (config.get('IMAGE_MAX_SIZE', (1600, 3200)), config.get('IMAGE_QUALITY', 85)),
+        'thumb': (config.get('IMAGE_THUMB_SIZE', (480, 960)), config.get('IMAGE_THUMB_QUALITY', 75)),
+    }
+    created = []
+    try:
+        with Image.open(source) as image:
+            # JPEG 可直接按目标尺寸缩小解码，减少大图的解码开销
+            image.draft('RGB', sizes['full'][0])
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            for size in IMAGE_VARIANTS:
+                box, quality = sizes[size]
+                name = variant_name(filename, size)
+                _save_variant(image, upload_folder, name, box, quality)
+                created.append(name)
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"Error processing image {filename}: {e}", file=sys.stderr)
+    return created
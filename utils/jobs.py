@@ -0,0 +1,254 @@
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import pymysql
+from utils.database import execute_query, transaction
+from utils.metrics import background_jobs
+
+
+class JobQueue:
+    """基于 MySQL 的持久化后台任务队列（background_jobs 表，无需外部消息中间件）
+
+    - enqueue 写入一行并唤醒本进程的 worker；其他进程的 worker 按 poll_interval 轮询
+    - 领取任务使用 SELECT ... FOR UPDATE SKIP LOCKED，多进程、多线程不会重复领取
+    - 失败按 retry_base * 2^(attempts-1) 秒退避重试，超过 max_attempts 进入死信（status='dead'）
+    - worker 异常退出遗留的 running 任务在 lock_timeout 秒后重新入队
+    - worker 线程在首次请求时按进程启动（ensure_started），fork 出的子进程各自启动
+    """
+
+    def __init__(self, workers=2, poll_interval=5, max_attempts=5, retry_base=10,
+                 lock_timeout=120, retention_hours=24):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.lock_timeout = lock_timeout
+        self.retention_hours = retention_hours
+
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._stopping = False
+        self._last_maintenance = 0.0
+        self._completed = 0
+        self._failed = 0
+
+    def configure(self, workers=None, poll_interval=None, max_attempts=None, retry_base=None,
+                  lock_timeout=None, retention_hours=None):
+        with self._lock:
+            if workers is not None:
+                self.workers = workers
+            if poll_interval is not None:
+                self.poll_interval = poll_interval
+            if max_attempts is not None:
+                self.max_attempts = max_attempts
+            if retry_base is not None:
+                self.retry_base = retry_base
+            if lock_timeout is not None:
+                self.lock_timeout = lock_timeout
+            if retention_hours is not None:
+                self.retention_hours = retention_hours
+
+    def handler(self, kind):
+        """注册任务处理函数：@job_queue.handler('kind')，payload 作为关键字参数传入"""
+        def decorator(func):
+            self._handlers[kind] = func
+            return func
+        return decorator
+
+    def enqueue(self, kind, max_attempts=None, **payload):
+        """写入任务并立即提交，返回任务 id；数据库不可用时返回 None（调用方可改为同步处理）"""
+        try:
+            with transaction() as cursor:
+                cursor.execute('''
+                    INSERT INTO background_jobs (kind, payload, max_attempts)
+                    VALUES (%s, %s, %s)
+                ''', (kind, json.dumps(payload, ensure_ascii=False), max_attempts or self.max_attempts))
+                job_id = cursor.lastrowid
+        except pymysql.Error as e:
+            print(f"Error enqueueing job {kind}: {e}", file=sys.stderr)
+            return None
+        self._wakeup.set()
+        return job_id
+
+    def ensure_started(self, app):
+        """在当前进程启动 worker 线程（已启动时直接返回）"""
+        if self.workers <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopping = False
+            self._wakeup = threading.Event()
+            self._threads = []
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, args=(app,),
+                                          name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=10):
+        """通知 worker 在当前任务结束后退出（gunicorn worker_exit 时调用）"""
+        self._stopping = True
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(max(0, deadline - time.monotonic()))
+
+    def _run(self, app):
+        worker_id = f'{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}'
+        while not self._stopping:
+            job = None
+            try:
+                # 领取与执行分别使用独立的应用上下文，处理期间不占用连接池中的连接
+                with app.app_context():
+                    self._maintain()
+                    job = self._claim(worker_id)
+                if job is not None:
+                    with app.app_context():
+                        self._execute(job)
+            except Exception as e:
+                print(f"Job worker error: {e}", file=sys.stderr)
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _maintain(self):
+        """定期把超时的 running 任务重新入队，并清理过期的已完成任务（每进程每分钟一次）"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_maintenance < 60:
+                return
+            self._last_maintenance = now
+        execute_query('''
+            UPDATE background_jobs
+            SET status = IF(attempts >= max_attempts, 'dead', 'queued'),
+                locked_by = NULL, locked_at = NULL, last_error = 'worker lost'
+            WHERE status = 'running' AND locked_at < NOW() - INTERVAL %s SECOND
+        ''', (self.lock_timeout,))
+        execute_query('''
+            DELETE FROM background_jobs
+            WHERE status = 'done' AND updated_at < NOW() - INTERVAL %s HOUR
+            LIMIT 1000
+        ''', (self.retention_hours,))
+
+    def _claim(self, worker_id):
+        with transaction() as cursor:
+            cursor.execute('''
+                SELECT id, kind, payload, attempts, max_attempts
+                FROM background_jobs
+                WHERE status = 'queued' AND run_after <= NOW()
+                ORDER BY run_after, id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            ''')
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            cursor.execute('''
+                UPDATE background_jobs
+                SET status = 'running', attempts = attempts + 1, locked_by = %s, locked_at = NOW()
+                WHERE id = %s
+            ''', (worker_id, row[0]))
+        return {
+            'id': row[0],
+            'kind': row[1],
+            'payload': json.loads(row[2]),
+            'attempts': row[3] + 1,
+            'max_attempts': row[4],
+        }
+
+    def _execute(self, job):
+        try:
+            handler = self._handlers.get(job['kind'])
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind {job['kind']}")
+            handler(**job['payload'])
+        except Exception as e:
+            self._fail(job, e)
+            return
+        execute_query('''
+            UPDATE background_jobs
+            SET status = 'done', locked_by = NULL, locked_at = NULL, last_error = NULL
+            WHERE id = %s
+        ''', (job['id'],))
+        with self._lock:
+            self._completed += 1
+        background_jobs.inc(labels=(job['kind'], 'done'))
+
+    def _fail(self, job, error):
+        dead = job['attempts'] >= job['max_attempts']
+        delay = self.retry_base * 2 ** (job['attempts'] - 1)
+        message = f'{type(error).__name__}: {error}'[:2000]
+        print(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed: {message}", file=sys.stderr)
+        execute_query('''
+            UPDATE background_jobs
+            SET status = %s, run_after = NOW() + INTERVAL %s SECOND,
+                locked_by = NULL, locked_at = NULL, last_error = %s
+            WHERE id = %s
+        ''', ('dead' if dead else 'queued', delay, message, job['id']))
+        with self._lock:
+            self._failed += 1
+        background_jobs.inc(labels=(job['kind'], 'dead' if dead else 'retry'))
+
+    def dead_letters(self, limit=50):
+        """死信列表（最近的在前）"""
+        rows = execute_query('''
+            SELECT id, kind, payload, attempts, last_error, created_at, updated_at
+            FROM background_jobs
+            WHERE status = 'dead'
+            ORDER BY id DESC
+            LIMIT %s
+        ''', (limit,), fetch=True) or []
+        return [{
+            'id': row[0],
+            'kind': row[1],
+            'payload': json.loads(row[2]),
+            'attempts': row[3],
+            'last_error': row[4],
+            'created_at': row[5].isoformat() if row[5] else None,
+            'updated_at': row[6].isoformat() if row[6] else None,
+        } for row in rows]
+
+    def retry(self, job_id):
+        """将死信任务重新入队，返回是否成功"""
+        result = execute_query('''
+            UPDATE background_jobs
+            SET status = 'queued', attempts = 0, run_after = NOW(), last_error = NULL
+            WHERE id = %s AND status = 'dead'
+        ''', (job_id,))
+        if result:
+            self._wakeup.set()
+        return bool(result)
+
+    def stats(self):
+        rows = execute_query('''
+            SELECT status, COUNT(*), MIN(created_at)
+            FROM background_jobs
+            GROUP BY status
+        ''', fetch=True) or []
+        counts = {status: 0 for status in ('queued', 'running', 'done', 'dead')}
+        oldest_queued = None
+        for status, count, oldest in rows:
+            counts[status] = count
+            if status == 'queued' and oldest:
+                oldest_queued = oldest.isoformat()
+        with self._lock:
+            return {
+                'counts': counts,
+                'oldest_queued': oldest_queued,
+                'workers': self.workers,
+                'workers_alive': sum(1 for thread in self._threads if thread.is_alive()) if self._pid == os.getpid() else 0,
+                'completed': self._completed,
+                'failed': self._failed,
+            }
+
+
+job_queue = JobQueue()
@@ -0,0 +1,405 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台没有文件锁，多进程汇总时不串行化合并
+    fcntl = None
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labels, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _ShardedMetric:
+    """按线程分片存储的指标：写入只改本线程的字典，不需要加锁
+
+    线程结束后其分片在采集或新建分片时并入 _retired，避免每请求一个线程的服务器上分片无限增长。
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []  # (thread, values)
+        self._retired = {}
+
+    def _values(self):
+        values = getattr(self._local, 'values', None)
+        if values is None:
+            values = self._local.values = {}
+            with self._lock:
+                if len(self._shards) >= 64:
+                    self._retire_dead_shards()
+                self._shards.append((threading.current_thread(), values))
+        return values
+
+    def _retire_dead_shards(self):
+        alive = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                alive.append((thread, values))
+            else:
+                for labels, value in list(values.items()):
+                    self._merge(self._retired, labels, value)
+        self._shards = alive
+
+    def _collect(self):
+        with self._lock:
+            self._retire_dead_shards()
+            merged = {}
+            for labels, value in self._retired.items():
+                self._merge(merged, labels, value)
+            for _, values in self._shards:
+                for labels, value in list(values.items()):
+                    self._merge(merged, labels, value)
+        return merged
+
+
+class Counter(_ShardedMetric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, labels=()):
+        values = self._values()
+        values[labels] = values.get(labels, 0) + amount
+
+    @staticmethod
+    def _merge(target, labels, value):
+        target[labels] = target.get(labels, 0) + value
+
+    def snapshot(self):
+        return self._collect()
+
+
+class Histogram(_ShardedMetric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        values = self._values()
+        entry = values.get(labels)
+        if entry is None:
+            # 各桶计数（非累积）+ 溢出桶 + [sum, count]
+            entry = values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+    @staticmethod
+    def _merge(target, labels, value):
+        entry = target.get(labels)
+        if entry is None:
+            target[labels] = list(value)
+        else:
+            for index, item in enumerate(value):
+                entry[index] += item
+
+    def snapshot(self):
+        return self._collect()
+
+
+class CallbackGauge:
+    """采集时调用函数取值的指标；函数返回数值或 {labels元组: 数值}"""
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, callback, labelnames=(), type_name='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.type_name = type_name
+
+    def snapshot(self):
+        try:
+            values = self.callback()
+        except Exception:
+            return {}
+        if values is None:
+            return {}
+        if not isinstance(values, dict):
+            values = {(): values}
+        return values
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback, labelnames=(), type_name='gauge'):
+        """注册回调型指标；同名重复注册时替换回调（应用重建时使用新的对象）"""
+        with self._lock:
+            metric = self._metrics[name] = CallbackGauge(name, documentation, callback, labelnames, type_name)
+            return metric
+
+    def snapshot(self):
+        """当前进程所有指标的可序列化快照：[{name, documentation, type, labelnames, buckets, values}]"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [{
+            'name': metric.name,
+            'documentation': metric.documentation,
+            'type': metric.type_name,
+            'labelnames': list(metric.labelnames),
+            'buckets': list(getattr(metric, 'buckets', ())),
+            'values': [[list(labels), value] for labels, value in metric.snapshot().items()],
+        } for metric in metrics]
+
+    def render(self):
+        """Prometheus 文本格式（text/plain; version=0.0.4）"""
+        return render_snapshot(self.snapshot())
+
+
+def _render_histogram(name, labelnames, buckets, labels, entry):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(tuple(buckets) + (float('inf'),), entry):
+        cumulative += count
+        le = '+Inf' if bound == float('inf') else _format_value(float(bound))
+        bucket_labels = _format_labels(labelnames, labels, 'le="%s"' % le)
+        lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+    label_text = _format_labels(labelnames, labels)
+    lines.append(f'{name}_sum{label_text} {_format_value(entry[-2])}')
+    lines.append(f'{name}_count{label_text} {entry[-1]}')
+    return lines
+
+
+def render_snapshot(snapshot):
+    """将 MetricsRegistry.snapshot() 格式的指标（单进程或多进程合并后）渲染为文本格式"""
+    lines = []
+    for metric in snapshot:
+        name, labelnames = metric['name'], metric['labelnames']
+        lines.append(f'# HELP {name} {metric["documentation"]}')
+        lines.append(f'# TYPE {name} {metric["type"]}')
+        for labels, value in sorted(metric['values'], key=lambda item: [str(label) for label in item[0]]):
+            if metric['type'] == 'histogram':
+                lines.extend(_render_histogram(name, labelnames, metric['buckets'], labels, value))
+            else:
+                lines.append(f'{name}{_format_labels(labelnames, labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _merge_snapshot(target, snapshot, include_gauges=True):
+    """把一个进程的快照累加到 target（name -> 指标字典）；gauge 可选择跳过"""
+    for metric in snapshot:
+        if metric['type'] == 'gauge' and not include_gauges:
+            continue
+        merged = target.get(metric['name'])
+        if merged is None:
+            merged = target[metric['name']] = dict(metric, values={})
+        values = merged['values']
+        for labels, value in metric['values']:
+            labels = tuple(labels)
+            current = values.get(labels)
+            if current is None:
+                values[labels] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                for index, item in enumerate(value):
+                    current[index] += item
+            else:
+                values[labels] = current + value
+    return target
+
+
+def _finish_merge(merged):
+    return [dict(metric, values=[[list(labels), value] for labels, value in metric['values'].items()])
+            for metric in merged.values()]
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MultiprocessMetrics:
+    """多 worker 进程的指标汇总（gunicorn 每个 worker 有独立的内存指标）
+
+    - 每个进程把快照写入 directory/metrics-<pid>.json（请求结束后最多每 interval 秒一次，
+      采集时和 worker 退出时强制写入）
+    - /metrics 由任一 worker 应答：合并目录中所有进程的快照。已退出进程的 counter/histogram
+      （含 counter 类型的回调指标）并入 retired.json，重启 worker 不会让累计值倒退；
+      gauge 只统计存活进程，按进程求和
+    - 存活进程的数据最多滞后 interval 秒
+    """
+
+    RETIRED = 'retired.json'
+
+    def __init__(self, registry, directory, interval=5):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, pid=None):
+        return os.path.join(self.directory, f'metrics-{pid or os.getpid()}.json')
+
+    @staticmethod
+    def _write_json(path, data):
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _read_json(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, force=False):
+        """写入本进程快照（未到间隔且非强制时跳过）"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_write < self.interval:
+                return
+            self._last_write = now
+        self._write_json(self._path(), self.registry.snapshot())
+
+    def _locked(self):
+        lock_file = open(os.path.join(self.directory, '.lock'), 'a')
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def collect(self):
+        """合并所有进程的快照，返回 MetricsRegistry.snapshot() 格式"""
+        self.write(force=True)
+        lock_file = self._locked()
+        try:
+            retired_path = os.path.join(self.directory, self.RETIRED)
+            retired = _merge_snapshot({}, self._read_json(retired_path) or [])
+            live = []
+            folded = []
+            for name in os.listdir(self.directory):
+                if not (name.startswith('metrics-') and name.endswith('.json')):
+                    continue
+                try:
+                    pid = int(name[len('metrics-'):-len('.json')])
+                except ValueError:
+                    continue
+                snapshot = self._read_json(os.path.join(self.directory, name))
+                if snapshot is None:
+                    continue
+                if pid == os.getpid() or _process_alive(pid):
+                    live.append(snapshot)
+                else:
+                    _merge_snapshot(retired, snapshot, include_gauges=False)
+                    folded.append(name)
+            if folded:
+                self._write_json(retired_path, _finish_merge(retired))
+                for name in folded:
+                    os.remove(os.path.join(self.directory, name))
+        finally:
+            lock_file.close()
+
+        merged = {}
+        for snapshot in live:
+            _merge_snapshot(merged, snapshot)
+        _merge_snapshot(merged, _finish_merge(retired))
+        return _finish_merge(merged)
+
+    def render(self):
+        return render_snapshot(self.collect())
+
+
+registry = MetricsRegistry()
+multiprocess = None
+
+
+def configure_multiprocess(directory, interval=5):
+    """启用多进程汇总（directory 为空时保持单进程模式）"""
+    global multiprocess
+    multiprocess = MultiprocessMetrics(registry, directory, interval) if directory else None
+    return multiprocess
+
+
+def flush(force=False):
+    """多进程模式下写入本进程快照（请求结束时调用，按间隔节流）"""
+    if multiprocess is not None:
+        multiprocess.write(force)
+
+
+def render():
+    """/metrics 输出：多进程模式下为所有 worker 的合并结果，否则为本进程指标"""
+    if multiprocess is not None:
+        return multiprocess.render()
+    return registry.render()
+
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by endpoint', ('endpoint', 'method'))
+http_responses = registry.counter(
+    'http_responses_total', 'HTTP responses by endpoint and status code', ('endpoint', 'status'))
+db_query_duration = registry.histogram(
+    'db_query_duration_seconds', 'MySQL statement latency',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+upload_bytes = registry.counter(
+    'upload_bytes_total', 'Bytes written by uploaded screenshots')
+upload_deduplicated = registry.counter(
+    'upload_deduplicated_total', 'Uploads whose content was already stored')
+upload_duration = registry.histogram(
+    'upload_save_duration_seconds', 'Time spent saving one uploaded screenshot')
+background_jobs = registry.counter(
+    'background_jobs_total', 'Background job attempts by kind and result', ('kind', 'result'))
+cleanup_duration = registry.histogram(
+    'cleanup_job_duration_seconds', 'Data cleanup job duration', ('job',),
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+
+
+class timed:
+    """计时上下文：with timed(histogram, labels): ..."""
+
+    def __init__(self, histogram, labels=()):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, self.labels)
+        return False
@@ -0,0 +1,168 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from utils.database import execute_query
+
+
+class OccupancyIndex:
+    """进程内场地占用索引：(日期, 时间段) -> 场地占用位图
+
+    - 懒加载：未命中时由调用方查询数据库后写入
+    - LRU 淘汰：最多保留 max_entries 个 (日期, 时间段)
+    - ttl：条目最长有效秒数，限制多进程部署时其他进程写入造成的延迟
+    - 所有写操作（预订、删除、审核、迁移、清理）需调用 invalidate
+    - invalidate 同时递增数据库中的共享版本（occupancy_versions 表，按日期一行，另有全局一行），
+      ETag 由共享版本生成，所有 worker 对同一份数据给出相同的 ETag
+    """
+
+    GLOBAL_SCOPE = '*'
+
+    def __init__(self, max_entries=512, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (date, slot) -> (mask, expires_at)
+        self._epoch = 0  # invalidate_all 时递增
+        self._generations = {}  # date -> 该日期被 invalidate 的次数
+        self._shared_seen = {}  # scope -> 本进程最近读到的共享版本
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def configure(self, max_entries=None, ttl=None):
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if ttl is not None:
+                self.ttl = ttl
+            self._entries.clear()
+
+    @staticmethod
+    def _key(venue_date, time_slot):
+        return (str(venue_date), time_slot)
+
+    def get(self, venue_date, time_slot):
+        """返回占用位图，未缓存或已过期返回 None"""
+        key = self._key(venue_date, time_slot)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def version(self, venue_date):
+        """日期的数据版本，任何针对该日期的 invalidate 都会改变它"""
+        with self._lock:
+            return (self._epoch, self._generations.get(str(venue_date), 0))
+
+    def shared_versions(self, venue_dates):
+        """一次查询读取全局及各日期的共享版本 {scope: version}，查询失败返回 None
+
+        某个版本与本进程上次读到的不同，说明其他进程写入过，先丢弃本进程对应的缓存条目。
+        """
+        scopes = [self.GLOBAL_SCOPE, *dict.fromkeys(str(venue_date) for venue_date in venue_dates)]
+        placeholders = ','.join(['%s'] * len(scopes))
+        rows = execute_query(f'SELECT scope, version FROM occupancy_versions WHERE scope IN ({placeholders})',
+                             scopes, fetch='all')
+        if rows is None:
+            return None
+        versions = dict.fromkeys(scopes, 0)
+        versions.update((scope, int(version)) for scope, version in rows)
+
+        with self._lock:
+            for scope, version in versions.items():
+                seen = self._shared_seen.get(scope)
+                self._shared_seen[scope] = version
+                if seen is None or seen == version:
+                    continue
+                if scope == self.GLOBAL_SCOPE:
+                    self._epoch += 1
+                    self._entries.clear()
+                else:
+                    self._generations[scope] = self._generations.get(scope, 0) + 1
+                    for key in [key for key in self._entries if key[0] == scope]:
+                        del self._entries[key]
+        return versions
+
+    def etag(self, venue_dates, *parts):
+        """由共享版本生成的强 ETag（venue_dates 为单个日期或日期列表），数据库不可用时返回 None
+
+        同一份数据在任何 worker 上得到相同的 ETag，数据未变化时 ETag 也不变。
+        """
+        if not isinstance(venue_dates, (list, tuple)):
+            venue_dates = [venue_dates]
+        versions = self.shared_versions(venue_dates)
+        if versions is None:
+            return None
+        key = '|'.join(f'{scope}={version}' for scope, version in versions.items())
+        key += '|' + '|'.join(str(part) for part in parts)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+    def put(self, venue_date, time_slot, mask, version=None):
+        """写入占用位图；传入查询前取得的 version 时，期间若已失效则丢弃，避免写回旧数据"""
+        if self.max_entries <= 0:
+            return
+        key = self._key(venue_date, time_slot)
+        with self._lock:
+            if version is not None and version != (self._epoch, self._generations.get(key[0], 0)):
+                return
+            self._entries[key] = (mask, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, venue_dates, time_slot=None):
+        """清除某日期（可指定时间段）的缓存；venue_dates 为单个日期或日期列表，共享版本一次递增"""
+        if not isinstance(venue_dates, (list, tuple)):
+            venue_dates = [venue_dates]
+        venue_dates = list(dict.fromkeys(str(venue_date) for venue_date in venue_dates))
+        with self._lock:
+            for venue_date in venue_dates:
+                self._invalidations += 1
+                self._generations[venue_date] = self._generations.get(venue_date, 0) + 1
+                if time_slot is not None:
+                    self._entries.pop((venue_date, time_slot), None)
+                else:
+                    for key in [key for key in self._entries if key[0] == venue_date]:
+                        del self._entries[key]
+        self._bump_shared(*venue_dates)
+
+    def invalidate_all(self):
+        with self._lock:
+            self._invalidations += 1
+            self._epoch += 1
+            self._entries.clear()
+        self._bump_shared(self.GLOBAL_SCOPE)
+
+    @staticmethod
+    def _bump_shared(*scopes):
+        """一条语句递增若干共享版本（在写入提交之后调用，读到新版本时数据一定已可见）"""
+        execute_query(f'''
+            INSERT INTO occupancy_versions (scope, version) VALUES {','.join(['(%s, 1)'] * len(scopes))}
+            ON DUPLICATE KEY UPDATE version = version + 1
+        ''', tuple(str(scope) for scope in scopes))
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+            }
+
+
+occupancy_index = OccupancyIndex()
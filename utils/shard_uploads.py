@@ -0,0 +1,57 @@
+"""将根目录下的旧截图迁移到 ab/cd/ 分片目录
+
+    python -m utils.shard_uploads [--upload-folder /image] [--dry-run]
+
+可在服务运行时执行：每个文件用 os.replace 原子移动，/uploads/<filename>
+会先查分片目录再查根目录，迁移过程中旧链接始终可用。可重复执行，已迁移的文件不会再处理。
+"""
+import argparse
+import os
+import sys
+from config import Config
+from utils.storage import iter_uploads, sharded_path
+
+
+def shard_existing_uploads(upload_folder, dry_run=False, verbose=False):
+    """移动根目录下的文件到分片目录，返回统计信息"""
+    stats = {'moved': 0, 'duplicates': 0, 'errors': 0}
+    for filename, path in iter_uploads(upload_folder, include_sharded=False):
+        target = sharded_path(upload_folder, filename)
+        try:
+            if os.path.exists(target):
+                # 分片目录已有同名文件（内容寻址的文件名相同即内容相同），移除根目录副本
+                if not dry_run:
+                    os.remove(path)
+                stats['duplicates'] += 1
+                continue
+            if not dry_run:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(path, target)
+            stats['moved'] += 1
+            if verbose:
+                print(f'{filename} -> {os.path.relpath(target, upload_folder)}')
+        except OSError as e:
+            stats['errors'] += 1
+            print(f'Error moving {filename}: {e}', file=sys.stderr)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Move flat uploads into two-level shard directories')
+    parser.add_argument('--upload-folder', default=Config.UPLOAD_FOLDER)
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be moved')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.upload_folder):
+        print(f'Upload folder not found: {args.upload_folder}', file=sys.stderr)
+        return 1
+
+    stats = shard_existing_uploads(args.upload_folder, args.dry_run, args.verbose)
+    prefix = '[dry run] ' if args.dry_run else ''
+    print(f"{prefix}moved={stats['moved']} duplicates={stats['duplicates']} errors={stats['errors']}")
+    return 1 if stats['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import hashlib
+import os
+import re
+import secrets
+from collections import Counter
+from flask import current_app
+from utils.database import transaction
+
+CHUNK_SIZE = 64 * 1024
+
+# 按内容寻址的文件名：sha256.扩展名；旧数据为 token_hex(16).扩展名，不做引用计数
+BLOB_NAME_RE = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+
+
+def is_blob_name(filename):
+    return bool(filename) and BLOB_NAME_RE.match(filename) is not None
+
+
+SHARD_RE = re.compile(r'^[0-9a-f]{4}')
+
+
+def shard_dir(filename):
+    """两级分片目录 ab/cd：十六进制文件名取前四位，其他文件名取其 sha1 前四位"""
+    key = filename[:4].lower()
+    if not SHARD_RE.match(key):
+        key = hashlib.sha1(filename.encode('utf-8')).hexdigest()[:4]
+    return os.path.join(key[:2], key[2:4])
+
+
+def sharded_path(upload_folder, filename):
+    return os.path.join(upload_folder, shard_dir(filename), filename)
+
+
+def resolve_upload(filename, upload_folder=None):
+    """返回上传文件的实际路径，不存在返回 None
+
+    新文件在分片目录，旧文件可能仍在根目录（迁移工具逐个移入分片）。
+    迁移只会从根目录移到分片，因此最后再查一次分片目录即可覆盖查找期间被移动的情况。
+    """
+    upload_folder = upload_folder or current_app.config['UPLOAD_FOLDER']
+    sharded = sharded_path(upload_folder, filename)
+    for path in (sharded, os.path.join(upload_folder, filename), sharded):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def iter_uploads(upload_folder, include_sharded=True):
+    """惰性遍历上传文件，产出 (文件名, 路径)：先根目录（未迁移的旧文件），再各分片目录"""
+    shards = []
+    with os.scandir(upload_folder) as entries:
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_file():
+                yield entry.name, entry.path
+            elif include_sharded and entry.is_dir() and len(entry.name) == 2:
+                shards.append(entry.path)
+
+    for first in sorted(shards):
+        with os.scandir(first) as seconds:
+            second_paths = sorted(entry.path for entry in seconds if entry.is_dir() and len(entry.name) == 2)
+        for second in second_paths:
+            with os.scandir(second) as entries:
+                for entry in entries:
+                    if not entry.name.startswith('.') and entry.is_file():
+                        yield entry.name, entry.path
+
+
+def _chunks(stream):
+    return iter(lambda: stream.read(CHUNK_SIZE), b'')
+
+
+def temp_upload_path(upload_folder):
+    return os.path.join(upload_folder, f'.upload-{secrets.token_hex(8)}.tmp')
+
+
+def _publish(temp_path, file_path):
+    """临时文件原子改名为正式文件名（同内容并发写入时后者覆盖前者，内容一致）"""
+    if os.name == 'posix':
+        os.chmod(temp_path, 0o644)
+    os.replace(temp_path, file_path)
+
+
+def verify_blob(filename, upload_folder=None):
+    """重新计算已保存文件的 SHA-256 并与文件名比对，不一致时抛出 ValueError
+
+    返回文件路径；文件已不存在（例如已被清理）时返回 None。旧的随机文件名不做校验。
+    """
+    path = resolve_upload(filename, upload_folder)
+    if path is None or not is_blob_name(filename):
+        return path
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in _chunks(f):
+            digest.update(chunk)
+    expected = filename.rsplit('.', 1)[0]
+    if digest.hexdigest() != expected:
+        raise ValueError(f'Checksum mismatch for {filename}: stored content hashes to {digest.hexdigest()}')
+    return path
+
+
+def add_reference(filename, sha256, size):
+    """登记一次引用（每条 venues 记录持有一次）"""
+    with transaction() as cursor:
+        cursor.execute('''
+            INSERT INTO upload_blobs (filename, sha256, size_bytes, ref_count)
+            VALUES (%s, %s, %s, 1)
+            ON DUPLICATE KEY UPDATE ref_count = ref_count + 1
+        ''', (filename, sha256, size))
+
+
+def release_references(cursor, filenames):
+    """在调用方事务内释放引用（同名出现几次释放几次）
+
+    返回 (已无引用的文件名, 未登记的旧文件名)。已无引用的记录已删除且行锁持有到提交，
+    调用方应在提交前删除对应文件，避免与同时上传相同内容的请求交错。
+    """
+    counts = Counter(filenames)
+    blob_names = sorted(name for name in counts if is_blob_name(name))
+    untracked = [name for name in counts if not is_blob_name(name)]
+    if not blob_names:
+        return [], untracked
+
+    placeholders = ', '.join(['%s'] * len(blob_names))
+    cursor.execute(f'''
+        SELECT filename, ref_count FROM upload_blobs
+        WHERE filename IN ({placeholders})
+        ORDER BY filename
+        FOR UPDATE
+    ''', blob_names)
+    rows = cursor.fetchall()
+    tracked = {row[0] for row in rows}
+    untracked.extend(name for name in blob_names if name not in tracked)
+
+    unreferenced = []
+    updates = []
+    for filename, ref_count in rows:
+        remaining = ref_count - counts[filename]
+        if remaining > 0:
+            updates.append((remaining, filename))
+        else:
+            unreferenced.append(filename)
+
+    if updates:
+        cursor.executemany('UPDATE upload_blobs SET ref_count = %s WHERE filename = %s', updates)
+    if unreferenced:
+        placeholders = ', '.join(['%s'] * len(unreferenced))
+        cursor.execute(f'DELETE FROM upload_blobs WHERE filename IN ({placeholders})', unreferenced)
+    return unreferenced, untracked
+
+
+def store_upload(file, file_ext):
+    """边读边计算 SHA-256，按内容命名保存上传文件（存入 ab/cd/ 分片目录）
+
+    返回 (文件名, 字节数, 是否实际写入)。内容已存在时只增加引用计数，不再写盘；
+    可 seek 的上传流先哈希再决定是否写入，否则边写临时文件边哈希。
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    stream = file.stream
+    digest = hashlib.sha256()
+    size = 0
+    temp_path = None
+
+    seekable = hasattr(stream, 'seekable') and stream.seekable()
+    if seekable:
+        for chunk in _chunks(stream):
+            digest.update(chunk)
+            size += len(chunk)
+        stream.seek(0)
+    else:
+        temp_path = temp_upload_path(upload_folder)
+        with open(temp_path, 'wb') as out:
+            for chunk in _chunks(stream):
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+
+    sha256 = digest.hexdigest()
+    filename = f'{sha256}.{file_ext}'
+    file_path = sharded_path(upload_folder, filename)
+
+    try:
+        # 先登记引用再检查文件：与 release_references 的行锁配合，保证检查到的文件不会随后被删除
+        add_reference(filename, sha256, size)
+        if resolve_upload(filename, upload_folder):
+            return filename, size, False
+
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        if temp_path is None:
+            temp_path = temp_upload_path(upload_folder)
+            with open(temp_path, 'wb') as out:
+                for chunk in _chunks(stream):
+                    out.write(chunk)
+        _publish(temp_path, file_path)
+        temp_path = None
+        return filename, size, True
+    finally:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)